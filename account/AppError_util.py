@@ -11,6 +11,7 @@ class ErrorCodes:
     DATABASE_ERROR = 1005
     ORDER_ERROR = 1006
     TRANSACTION_ERROR = 1007
+    BUSY_ERROR = 1008
 
 class AppError(APIException):
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -50,6 +51,10 @@ class AppError(APIException):
     def transaction(cls, detail=None):
         return cls(app_code=ErrorCodes.TRANSACTION_ERROR, detail=detail, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @classmethod
+    def busy(cls, detail=None):
+        return cls(app_code=ErrorCodes.BUSY_ERROR, detail=detail, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
     @classmethod
     def test_error(cls, detail=None):
         return cls(app_code='1000', detail=detail, status_code=status.HTTP_400_BAD_REQUEST)
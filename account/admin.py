@@ -1,7 +1,7 @@
 from django.contrib import admin
 from account.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Category, Course, Lesson, Comment, Report, Order
+from .models import Category, Course, Lesson, Comment, Report, Order, RevenueRollup, Task, UserToken
 
 
 class UserModelAdmin(BaseUserAdmin):
@@ -45,7 +45,6 @@ class UserModelAdmin(BaseUserAdmin):
                 'address',
                 'enrolled_courses',
                 'website',
-                'token',
                 'about',
             ),
         }),
@@ -62,7 +61,7 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'tutor', 'about', 'tagline', 'category',
-                    'difficulty', 'thumbnail', 'price', 'is_visible', 'created_at', 'updated_at')
+                    'difficulty', 'price', 'is_visible', 'created_at', 'updated_at')
 
 
 @admin.register(Lesson)
@@ -86,5 +85,23 @@ class OrderAdmin(admin.ModelAdmin):
                     'price', 'created_at', 'updated_at')
 
 
+@admin.register(RevenueRollup)
+class RevenueRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'course', 'day', 'status', 'total', 'order_count')
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'run_at', 'attempts', 'max_attempts', 'created_at')
+    list_filter = ('status', 'name')
+
+
+@admin.register(UserToken)
+class UserTokenAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'token_type', 'jti', 'issued_at', 'expires_at', 'revoked_at')
+    list_filter = ('token_type',)
+    search_fields = ('jti', 'user__email')
+
+
 # Now register the new UserModelAdmin...
 admin.site.register(User, UserModelAdmin)
@@ -7,4 +7,6 @@ class AccountConfig(AppConfig):
     name = 'account'
 
     def ready(self):
+        import account.checks  # noqa
         import account.signals  # noqa
+        import account.utils  # noqa (registers the send_email task)
@@ -0,0 +1,184 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .generations import shared_cache
+from .models import User
+from .revocation import is_revoked, revocation_filter
+
+AUTH_USER_CACHE_TTL = getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+AUTH_USER_CACHE_SIZE = getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+
+
+class LocalUserCache:
+    """
+    Small thread-safe in-process LRU of users with a per-entry TTL.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, entry_version, expires = entry
+            if entry_version != version or expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user, version):
+        with self._lock:
+            self._entries[user_id] = (user, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_users = LocalUserCache(AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL)
+
+# Returned by get_cached_user(cached_only=True) when the user isn't cached
+MISSING = object()
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _version_key(user_id):
+    return f'auth:user-version:{user_id}'
+
+
+def _user_version(user_id):
+    versions = shared_cache()
+    key = _version_key(user_id)
+    version = versions.get(key)
+    if version is None:
+        versions.add(key, time.time_ns(), None)
+        version = versions.get(key)
+    return version
+
+
+def get_cached_user(user_id, cached_only=False):
+    """
+    Resolve a user through the in-process LRU, then the default cache, then
+    the database, so each user costs at most one query per TTL window.
+
+    Every lookup checks the user's version counter in the shared cache
+    alias (see generations.py), which invalidate_cached_user() bumps on
+    save, so blocking, deactivating or deleting a user is seen by every
+    worker on its very next request. If that alias is a per-process
+    backend, other workers keep the old user for up to
+    AUTH_USER_CACHE_TTL seconds; checks.py warns about that setup.
+    :param user_id: The user's primary key.
+    :param cached_only: Return MISSING instead of querying the database,
+        e.g. from async code that would rather not leave the event loop.
+    :return: A private copy of the user, or None if there is no such user.
+    """
+    version = _user_version(user_id)
+    user = local_users.get(user_id, version)
+    if user is None:
+        entry = cache.get(_user_key(user_id))
+        if entry is not None and entry[0] == version:
+            user = entry[1]
+        elif cached_only:
+            return MISSING
+        else:
+            try:
+                user = User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(_user_key(user_id), (version, user), AUTH_USER_CACHE_TTL)
+        local_users.set(user_id, user, version)
+    # Requests may modify request.user, so never hand out the shared instance
+    return copy.copy(user)
+
+
+def invalidate_cached_user(user_id):
+    versions = shared_cache()
+    try:
+        versions.incr(_version_key(user_id))
+    except ValueError:
+        versions.add(_version_key(user_id), time.time_ns(), None)
+    cache.delete(_user_key(user_id))
+    local_users.discard(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves users through get_cached_user() rather
+    than loading the full user row on every request, rejects blocked users
+    as well as inactive ones, and rejects revoked tokens (see revocation.py).
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token[api_settings.JTI_CLAIM]):
+            raise InvalidToken({
+                'detail': _('Token has been revoked'),
+                'code': 'token_revoked',
+            })
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if user.is_blocked:
+            raise AuthenticationFailed(_('User is blocked'), code='user_blocked')
+
+        return user
+
+    def authenticate_from_cache(self, request):
+        """
+        authenticate() for async code that must not touch the database.
+        :return: (user, token), None when the request carries no token, or
+            MISSING when the user isn't cached or authentication fails (the
+            regular path then loads the user or produces the error).
+        """
+        try:
+            header = self.get_header(request)
+            raw_token = self.get_raw_token(header) if header is not None else None
+            if raw_token is None:
+                return None
+            validated_token = super().get_validated_token(raw_token)
+            # A stale filter needs the database to rebuild, and a match to confirm
+            if not revocation_filter.is_fresh() or validated_token[api_settings.JTI_CLAIM] in revocation_filter:
+                return MISSING
+            user = get_cached_user(validated_token[api_settings.USER_ID_CLAIM], cached_only=True)
+        except (AuthenticationFailed, InvalidToken, KeyError):
+            return MISSING
+        if user is MISSING or user is None or not user.is_active or user.is_blocked:
+            return MISSING
+        return user, validated_token
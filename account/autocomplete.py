@@ -0,0 +1,259 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Course
+
+AUTOCOMPLETE_TTL = getattr(settings, 'AUTOCOMPLETE_TTL', 10 * 60)
+AUTOCOMPLETE_LIMIT = getattr(settings, 'AUTOCOMPLETE_LIMIT', 10)
+# Prefixes matching more title words than this keep a bitset of their
+# courses instead of being ranked course by course (see PrefixEntries)
+AUTOCOMPLETE_PRECOMPUTE_THRESHOLD = getattr(settings, 'AUTOCOMPLETE_PRECOMPUTE_THRESHOLD', 500)
+AUTOCOMPLETE_MEMO_SIZE = getattr(settings, 'AUTOCOMPLETE_MEMO_SIZE', 10000)
+
+
+def normalize(text):
+    """
+    The lowercase words of `text` with accents stripped, so "Éco" matches "eco".
+    """
+    text = (text or '').lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r'\w+', text)
+
+
+def lowest_bits(mask, count):
+    """
+    The positions of the `count` lowest set bits of `mask`.
+    """
+    positions = []
+    while mask and len(positions) < count:
+        low = mask & -mask
+        positions.append(low.bit_length() - 1)
+        mask ^= low
+    return positions
+
+
+class PrefixEntries:
+    """
+    Course ids keyed by every word of their title and category title, in
+    one sorted array: the keys starting with a prefix are a contiguous
+    range found with two bisections.
+
+    Courses are ranked by their position in `order`, most enrolled first.
+    Prefixes matching more than `precompute_threshold` keys also get a
+    bitset of the positions they match, so their best courses are the
+    lowest set bits, and the courses matching several such prefixes are a
+    bitwise AND away; only short ranges are ranked course by course.
+    Not thread-safe; see PrefixIndex.
+    """
+
+    def __init__(self, courses, limit, precompute_threshold, memo_size):
+        """
+        :param courses: (id, title, category title, popularity) tuples.
+        """
+        self.limit = limit
+        self.precompute_threshold = precompute_threshold
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+        self.titles, self.words, self.positions, self.order = {}, {}, {}, []
+        pairs = []
+        categories = {}
+        for course_id, title, category, _ in sorted(courses, key=lambda course: (-course[3], course[0])):
+            if category not in categories:
+                categories[category] = set(normalize(category))
+            words = self.index_words(course_id, title, categories[category])
+            pairs.extend((word, course_id) for word in words)
+        pairs.sort()
+        self.keys = [word for word, _ in pairs]
+        self.ids = [course_id for _, course_id in pairs]
+
+        self.masks = {}
+        for prefix in {word[:length] for word in set(self.keys) for length in range(1, len(word) + 1)}:
+            low, high = self.range(prefix)
+            if high - low > precompute_threshold:
+                bits = bytearray(len(self.order) // 8 + 1)
+                for course_id in self.ids[low:high]:
+                    position = self.positions[course_id]
+                    bits[position >> 3] |= 1 << (position & 7)
+                self.masks[prefix] = int.from_bytes(bits, 'little')
+
+    def index_words(self, course_id, title, category_words):
+        if course_id not in self.positions:
+            self.positions[course_id] = len(self.order)
+            self.order.append(course_id)
+        words = set(normalize(title)) | category_words
+        # " word word": a word starts with X if " X" is a substring
+        self.titles[course_id], self.words[course_id] = title, ''.join(' ' + word for word in words)
+        return words
+
+    def range(self, prefix):
+        return bisect_left(self.keys, prefix), bisect_right(self.keys, prefix + '\U0010ffff')
+
+    def complete(self, terms):
+        key = ' '.join(terms)
+        if key in self.memo:
+            self.memo.move_to_end(key)
+            return self.memo[key]
+        light = [term for term in terms if term not in self.masks]
+        if light:
+            # Rank the shortest range, checking the other words against its titles
+            light.sort(key=lambda term: (lambda low, high: high - low)(*self.range(term)))
+            low, high = self.range(light[0])
+            others = [' ' + term for term in terms if term != light[0]]
+            candidates = {course_id for course_id in self.ids[low:high]
+                          if all(other in self.words[course_id] for other in others)}
+            ids = heapq.nsmallest(self.limit, candidates, key=self.positions.__getitem__)
+        else:
+            mask = self.masks[terms[0]]
+            for term in terms[1:]:
+                mask &= self.masks[term]
+            ids = [self.order[position] for position in lowest_bits(mask, self.limit)]
+        self.memo[key] = ids
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return ids
+
+    def add(self, course_id, title, category):
+        """
+        Index a course. One seen before keeps its rank; a new one ranks
+        last until the next rebuild.
+        """
+        self.memo.clear()
+        for word in self.index_words(course_id, title, set(normalize(category))):
+            position = bisect_right(self.keys, word)
+            self.keys.insert(position, word)
+            self.ids.insert(position, course_id)
+            self._set_bits(word, course_id, True)
+
+    def remove(self, course_id):
+        if course_id not in self.titles:
+            return
+        self.memo.clear()
+        for word in self.words.pop(course_id).split():
+            low, high = bisect_left(self.keys, word), bisect_right(self.keys, word)
+            position = self.ids.index(course_id, low, high)
+            del self.keys[position]
+            del self.ids[position]
+            self._set_bits(word, course_id, False)
+        del self.titles[course_id]
+
+    def _set_bits(self, word, course_id, value):
+        bit = 1 << self.positions[course_id]
+        for length in range(1, len(word) + 1):
+            prefix = word[:length]
+            if prefix in self.masks:
+                self.masks[prefix] = self.masks[prefix] | bit if value else self.masks[prefix] & ~bit
+
+
+class PrefixIndex:
+    """
+    Autocomplete over the titles (and category titles) of visible courses,
+    most enrolled first.
+
+    Built on first use, and rebuilt in a background thread once it is
+    AUTOCOMPLETE_TTL seconds old, which picks up enrollment changes and
+    course edits made by other processes; signals.py applies this
+    process's edits as they commit.
+    """
+
+    def __init__(self, ttl, limit, precompute_threshold, memo_size):
+        self.ttl = ttl
+        self.limit = limit
+        self.precompute_threshold = precompute_threshold
+        self.memo_size = memo_size
+        self._entries = None
+        self._built_at = 0
+        # Edits made while a rebuild runs, which its query may have missed
+        self._pending = []
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild_in_background(self):
+        try:
+            self._rebuild()
+        finally:
+            self._build_lock.release()
+            # The thread's own connection would otherwise stay open
+            connection.close()
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending = []
+        courses = Course.objects.filter(is_visible=True).annotate(popularity=Count('user')).values_list(
+            'id', 'title', 'category__title', 'popularity')
+        entries = PrefixEntries(courses, self.limit, self.precompute_threshold, self.memo_size)
+        with self._lock:
+            for course_id, course in self._pending:
+                self._apply(entries, course_id, course)
+            self._entries, self._built_at, self._pending = entries, time.monotonic(), []
+
+    def _ensure_fresh(self):
+        if self._entries is None:
+            with self._build_lock:
+                if self._entries is None:
+                    self._rebuild()
+        elif time.monotonic() - self._built_at >= self.ttl and self._build_lock.acquire(blocking=False):
+            # Requests keep answering from the current entries meanwhile
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def complete(self, query):
+        """
+        Visible courses with words starting with every word of `query`.
+        :return: Up to `limit` {'id', 'title'} dicts, most enrolled first.
+        """
+        terms = normalize(query)
+        if not terms:
+            return []
+        self._ensure_fresh()
+        with self._lock:
+            entries = self._entries
+            return [{'id': course_id, 'title': entries.titles[course_id]}
+                    for course_id in entries.complete(terms)]
+
+    def update(self, course):
+        """
+        Apply a saved course: re-key it, or drop it if it is hidden.
+        """
+        if course.is_visible:
+            category = course.category.title if course.category_id else None
+            self._edit(course.pk, (course.title, category))
+        else:
+            self._edit(course.pk, None)
+
+    def remove(self, course_id):
+        self._edit(course_id, None)
+
+    def _edit(self, course_id, course):
+        with self._lock:
+            if self._build_lock.locked():
+                self._pending.append((course_id, course))
+            if self._entries is not None:
+                self._apply(self._entries, course_id, course)
+
+    @staticmethod
+    def _apply(entries, course_id, course):
+        entries.remove(course_id)
+        if course is not None:
+            entries.add(course_id, *course)
+
+    def clear(self):
+        with self._lock:
+            self._entries = None
+
+
+prefix_index = PrefixIndex(AUTOCOMPLETE_TTL, AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_PRECOMPUTE_THRESHOLD,
+                           AUTOCOMPLETE_MEMO_SIZE)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .generations import SHARED_CACHE_ALIAS
+
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def _shared_cache_is_local():
+    backend = settings.CACHES.get(SHARED_CACHE_ALIAS, {}).get('BACKEND')
+    return backend in LOCAL_CACHE_BACKENDS
+
+
+MESSAGE = (f'The shared cache alias {SHARED_CACHE_ALIAS!r} uses a per-process backend, so writes, '
+           'blocked users and revoked tokens are only seen by the worker that made them until '
+           'the cached copies time out.')
+HINT = 'Point SHARED_CACHE_ALIAS at a cache every worker shares (Memcached, Redis or the database cache).'
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if _shared_cache_is_local():
+        return [Warning(MESSAGE, hint=HINT, id='account.W001')]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache_deploy(app_configs, **kwargs):
+    if _shared_cache_is_local():
+        return [Error(MESSAGE, hint=HINT, id='account.E001')]
+    return []
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .generations import get_generations
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET (ETag / Last-Modified / 304) for ModelViewSets whose
+    model has an `updated_at` column.
+
+    Detail validators come from the object's `updated_at`; list ETags
+    from MAX(updated_at) and COUNT(*) over the filtered queryset, so
+    deletions change them too. Models whose rows are embedded in the
+    response (e.g. a course's lessons) are listed in
+    `conditional_dependencies`; their generation counters (see
+    generations.py) are folded into the ETag. A matching request is
+    answered with 304 before anything is serialized.
+    """
+    conditional_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        return self.conditional_response(
+            request, validators['last_modified'], validators['count'],
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        last_modified = queryset.order_by().filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).values_list('updated_at', flat=True).first()
+        if last_modified is None:
+            # Let the regular path produce the 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request, last_modified, None,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+    def conditional_response(self, request, last_modified, count, get_response):
+        etag = self.compute_etag(request, last_modified, count)
+        # Last-Modified can't see deletions from a list, nor embedded rows,
+        # so it is only sent for details of models that embed nothing
+        timestamp = None
+        if last_modified is not None and count is None and not self.conditional_dependencies:
+            timestamp = int(last_modified.timestamp())
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = get_response()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def compute_etag(self, request, last_modified, count):
+        parts = [
+            type(self).__name__,
+            self.action,
+            request.get_full_path(),
+            getattr(request, 'accepted_media_type', ''),
+            request.user.pk if request.user.is_authenticated else '',
+            last_modified.isoformat() if last_modified else '',
+            count,
+            *get_generations(self.conditional_dependencies),
+        ]
+        digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        return quote_etag(digest)
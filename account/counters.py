@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Lesson, Report
+
+Like = Lesson.likes.through
+
+# Lesson counter column -> the model whose rows (each with a `lesson`) it counts
+COUNTED_MODELS = {
+    'like_count': Like,
+    'comment_count': Comment,
+    'report_count': Report,
+}
+
+
+def adjust_counter(lesson_ids, field, delta):
+    """
+    Atomically add `delta` to a counter of the given lessons. The database
+    does the arithmetic, so concurrent adjustments never overwrite each
+    other; decrements stop at zero.
+    """
+    value = F(field) + delta if delta >= 0 else Greatest(F(field) + delta, Value(0))
+    Lesson.objects.filter(pk__in=lesson_ids).update(**{field: value})
+
+
+def _count(field):
+    rows = (COUNTED_MODELS[field].objects.filter(lesson=OuterRef('pk'))
+            .order_by().values('lesson').annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount(lesson_ids=None, fields=None):
+    """
+    Set counters (all if None) of the given lessons (all if None) from the
+    rows they count, in one UPDATE.
+    """
+    fields = fields or COUNTED_MODELS
+    lessons = Lesson.objects.all() if lesson_ids is None else Lesson.objects.filter(pk__in=lesson_ids)
+    lessons.update(**{field: _count(field) for field in fields})
+
+
+def lesson_counter_drift():
+    """
+    Find lessons whose counters disagree with the rows they count.
+    :return: A list of (lesson_id, field, expected, actual) tuples.
+    """
+    lessons = Lesson.objects.annotate(**{f'expected_{field}': _count(field) for field in COUNTED_MODELS})
+    drifted = Q()
+    for field in COUNTED_MODELS:
+        drifted |= ~Q(**{field: F(f'expected_{field}')})
+    drift = []
+    for lesson in lessons.filter(drifted).order_by('pk'):
+        for field in COUNTED_MODELS:
+            expected, actual = getattr(lesson, f'expected_{field}'), getattr(lesson, field)
+            if expected != actual:
+                drift.append((lesson.pk, field, expected, actual))
+    return drift
+
+
+@transaction.atomic
+def reconcile_lesson_counters():
+    """
+    Repair the counters of every lesson that drifted, e.g. after likes,
+    comments or reports were written without signals (QuerySet.update(),
+    bulk_create(), raw SQL).
+    :return: The number of lessons repaired.
+    """
+    lesson_ids = {lesson_id for lesson_id, *_ in lesson_counter_drift()}
+    if lesson_ids:
+        recount(lesson_ids)
+    return len(lesson_ids)
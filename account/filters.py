@@ -0,0 +1,185 @@
+from collections import Counter
+
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class Facet:
+    """
+    A filter dimension of a list endpoint: `?<name>=a,b` keeps the rows
+    whose value is any of a or b, and the list reports how many rows each
+    value would match.
+    :param name: The query parameter, also the key in the `facets` output.
+    :param field: The lookup the dimension filters and groups on.
+    :param choices: The values allowed in the query parameter, in display
+        order; None accepts anything and orders the counts by count.
+    """
+
+    def __init__(self, name, field, choices=None):
+        self.name = name
+        self.field = field
+        self.choices = choices
+
+    def parse_value(self, value):
+        if self.choices is not None and value not in self.choices:
+            raise ValidationError({self.name: [f'"{value}" is not a valid choice.']})
+        return value
+
+    def selected(self, request):
+        """
+        The values selected by the request, or None when it doesn't filter on this facet.
+        """
+        value = request.query_params.get(self.name)
+        if value is None:
+            return None
+        values = [self.parse_value(item.strip()) for item in value.split(',') if item.strip()]
+        return values or None
+
+    def q(self, values):
+        return Q(**{f'{self.field}__in': values})
+
+    def expression(self):
+        """
+        The value of each row, to group the facet counts by.
+        """
+        return F(self.field)
+
+
+class BooleanFacet(Facet):
+    TRUE_VALUES = ('true', '1')
+    FALSE_VALUES = ('false', '0')
+
+    def __init__(self, name, field):
+        super().__init__(name, field, choices=[True, False])
+
+    def parse_value(self, value):
+        value = value.lower()
+        if value in self.TRUE_VALUES:
+            return True
+        if value in self.FALSE_VALUES:
+            return False
+        raise ValidationError({self.name: [f'"{value}" is not a valid boolean.']})
+
+
+class RangeFacet(Facet):
+    """
+    A numeric dimension split into named ranges, e.g. `?price=0-25,100+`.
+    :param ranges: (key, low, high) tuples; low is inclusive, high is
+        exclusive and None leaves the range open.
+    """
+
+    def __init__(self, name, field, ranges):
+        super().__init__(name, field, choices=[key for key, _, _ in ranges])
+        self.ranges = ranges
+
+    def range_q(self, low, high):
+        q = Q(**{f'{self.field}__gte': low})
+        if high is not None:
+            q &= Q(**{f'{self.field}__lt': high})
+        return q
+
+    def q(self, values):
+        q = Q()
+        for key, low, high in self.ranges:
+            if key in values:
+                q |= self.range_q(low, high)
+        return q
+
+    def expression(self):
+        return Case(
+            *(When(self.range_q(low, high), then=Value(key)) for key, low, high in self.ranges),
+            default=Value(None), output_field=CharField())
+
+
+class FacetFilterBackend(BaseFilterBackend):
+    """
+    Filters by the view's `facets`: values of one facet are ORed, facets
+    are ANDed.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        for facet in getattr(view, 'facets', ()):
+            values = facet.selected(request)
+            if values is not None:
+                queryset = queryset.filter(facet.q(values))
+        return queryset
+
+
+class CourseLessonsFilterBackend(BaseFilterBackend):
+    """
+    `?course=<id>` keeps one course's lessons, in course order: cursor
+    pagination then seeks on the (course, order_key, id) index instead of
+    walking them by creation date.
+    """
+    ordering = ('order_key', 'id')
+
+    @staticmethod
+    def selected_course(request):
+        value = request.query_params.get('course')
+        if value is None:
+            return None
+        if not value.isdigit():
+            raise ValidationError({'course': [f'"{value}" is not a valid course id.']})
+        return int(value)
+
+    def filter_queryset(self, request, queryset, view):
+        course_id = self.selected_course(request)
+        if course_id is None:
+            return queryset
+        return queryset.filter(course_id=course_id).order_by(*self.ordering)
+
+    def get_ordering(self, request, queryset, view):
+        # Consulted by CursorPagination in place of its own ordering
+        if getattr(view, 'action', None) != 'list' or self.selected_course(request) is None:
+            return view.pagination_class.ordering
+        return self.ordering
+
+
+def facet_counts(request, queryset, facets):
+    """
+    How many rows of `queryset` each value of each facet matches, given
+    the values the request selects on the other facets, so a client can
+    show what every checkbox would leave (disjunctive faceting).
+
+    A single query groups the rows by the values of every facet at once;
+    the counts for each facet are then summed from those groups.
+    :param queryset: The rows before the request's facet filters.
+    :return: {facet name: [{'value': value, 'count': count}, ...]}
+    """
+    selected = {facet.name: facet.selected(request) for facet in facets}
+    columns = {f'facet_{facet.name}': facet.expression() for facet in facets}
+    groups = queryset.order_by().values(**columns).annotate(facet_count=Count('pk'))
+
+    counts = {facet.name: Counter() for facet in facets}
+    for group in groups:
+        values = {facet.name: group[f'facet_{facet.name}'] for facet in facets}
+        matches = {name: selected[name] is None or value in selected[name] for name, value in values.items()}
+        for name in counts:
+            if all(match for other, match in matches.items() if other != name):
+                counts[name][values[name]] += group['facet_count']
+
+    result = {}
+    for facet in facets:
+        if facet.choices is not None:
+            result[facet.name] = [{'value': value, 'count': counts[facet.name][value]} for value in facet.choices]
+        else:
+            ordered = sorted(counts[facet.name].items(), key=lambda item: (-item[1], str(item[0])))
+            result[facet.name] = [{'value': value, 'count': count} for value, count in ordered]
+    return result
+
+
+class FacetedListMixin:
+    """
+    Adds `facets` (see facet_counts()) next to the results of the list
+    action. Use with FacetFilterBackend in `filter_backends`.
+    """
+    facets = ()
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.action == 'list':
+            # Counted over the unfiltered rows; the prefetches only matter for serializing
+            queryset = self.get_queryset().prefetch_related(None)
+            response.data['facets'] = facet_counts(self.request, queryset, self.facets)
+        return response
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Cache alias holding the counters that tell every worker process about
+# writes: generations here, user versions in authentication.py. It must be
+# shared by all workers (Memcached, Redis, the database cache); with a
+# per-process backend such as LocMemCache, other workers only notice a write
+# once their cached responses, users and revocation filters time out.
+# checks.py flags a local-memory alias.
+SHARED_CACHE_ALIAS = getattr(settings, 'SHARED_CACHE_ALIAS', 'default')
+
+
+def shared_cache():
+    return caches[SHARED_CACHE_ALIAS]
+
+
+def _cache_key(model):
+    return f'generation:{model._meta.label_lower}'
+
+
+def _initial_generation():
+    # Seeding from the clock means a counter lost from the cache never
+    # comes back with a value that was handed out before
+    return time.time_ns()
+
+
+def get_generations(models):
+    """
+    The current generation counter of each model, bumped whenever one of its
+    rows (or relations) changes. Use them in validators and cache keys.
+    :param models: The model classes to look up.
+    :return: A list of counters, in the same order as `models`.
+    """
+    cache = shared_cache()
+    keys = [_cache_key(model) for model in models]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _initial_generation(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump_generation(model):
+    cache = shared_cache()
+    key = _cache_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), None)
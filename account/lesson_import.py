@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from .generations import bump_generation
+from .models import Course, Lesson
+from .ordering import keys_after, last_key
+from .search import index_lessons
+from .serializers import LessonImportSerializer
+
+CourseLesson = Course.lessons.through
+
+LESSON_IMPORT_MAX_ROWS = getattr(settings, 'LESSON_IMPORT_MAX_ROWS', 1000)
+
+
+class LessonImportError(ValueError):
+    pass
+
+
+def read_lesson_file(upload):
+    """
+    Read the rows of an uploaded lesson file: CSV with a header row, or a
+    JSON list of objects. Empty CSV cells count as missing.
+    :return: A list of dicts.
+    """
+    name = (upload.name or '').lower()
+    try:
+        if name.endswith('.csv') or upload.content_type == 'text/csv':
+            reader = csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig'))
+            return [{key: value for key, value in row.items() if key and value not in ('', None)}
+                    for row in reader]
+        rows = json.load(upload)
+    except (UnicodeDecodeError, csv.Error, ValueError) as e:
+        raise LessonImportError(f'Could not read {upload.name}: {e}')
+    if not isinstance(rows, list):
+        raise LessonImportError('A JSON lesson file must hold a list of lessons')
+    return rows
+
+
+def validate_lesson_rows(rows):
+    """
+    Validate every row before anything is written.
+    :return: (validated rows, errors); errors is a list of
+             {'row': n, 'errors': {...}} dicts, numbered from 1.
+    """
+    if not isinstance(rows, list):
+        raise LessonImportError('Expected a list of lessons')
+    if not rows:
+        raise LessonImportError('No lessons given')
+    if len(rows) > LESSON_IMPORT_MAX_ROWS:
+        raise LessonImportError(f'At most {LESSON_IMPORT_MAX_ROWS} lessons can be created at once')
+    serializer = LessonImportSerializer(data=rows, many=True)
+    if serializer.is_valid():
+        return serializer.validated_data, []
+    errors = serializer.errors
+    if not isinstance(errors, list):
+        # Not a list of rows at all
+        raise LessonImportError('Expected a list of lessons')
+    return [], [{'row': number, 'errors': row_errors}
+                for number, row_errors in enumerate(errors, start=1) if row_errors]
+
+
+def create_lessons(course, rows):
+    """
+    Create validated lessons in a course with batched INSERTs for the
+    lessons and for their Course.lessons links: one each on PostgreSQL,
+    one per 999 parameters on SQLite (about 90 lessons), so an import
+    costs a handful of queries, not a few per row.
+
+    bulk_create() sends no signals, so the side effects signals.py has for
+    single saves are applied here: the lessons get order keys after the
+    course's last lesson, the catalog generation is bumped on commit and
+    the lessons are added to the search index. Their counters start at 0.
+    :return: The created lessons.
+    """
+    with transaction.atomic():
+        keys = keys_after(last_key(course.id), len(rows))
+        lessons = Lesson.objects.bulk_create([
+            Lesson(course=course, order_key=key, **row) for row, key in zip(rows, keys)])
+        CourseLesson.objects.bulk_create([CourseLesson(course=course, lesson=lesson) for lesson in lessons])
+        index_lessons(lessons)
+        transaction.on_commit(lambda: bump_generation(Lesson))
+    return lessons
@@ -0,0 +1,20 @@
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """
+    Run a benchmark against a throwaway test database so it never touches
+    real data, and start it with empty caches.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    for cache in caches.all():
+        cache.clear()
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
@@ -0,0 +1,83 @@
+import asyncio
+import statistics
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import Category, Course, Lesson, User
+
+from ._benchmark import benchmark_database
+
+URLCONFS = (('sync', 'djangoauthapi1.urls'), ('async', 'djangoauthapi1.asgi_urls'))
+
+
+class Command(BaseCommand):
+    help = ('Compare throughput of the hot catalog reads under concurrent clients, '
+            'served by the sync views and by the async ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help='Requests per client.')
+        parser.add_argument('--courses', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            course_ids, token = self.seed(options['courses'])
+            groups = {
+                'course list': ['/api/courses/'],
+                'course detail': [f'/api/courses/{course_id}/' for course_id in course_ids],
+                'profile': ['/api/auth/profile/'],
+                'enrollment check': [f'/api/user/details/enrolled/{course_id}/check/' for course_id in course_ids],
+                'lessons': ['/api/lessons/'],
+            }
+            self.stdout.write(f'{options["clients"]} concurrent clients x {options["requests"]} requests')
+            for name, urls in groups.items():
+                for label, urlconf in URLCONFS:
+                    for cache in caches.all():
+                        cache.clear()
+                    with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=['testserver']):
+                        # One pass to warm the caches, as in a running server
+                        asyncio.run(self.client_loop(urls, token, len(urls), 0))
+                        latencies, elapsed = asyncio.run(
+                            self.run(urls, token, options['clients'], options['requests']))
+                    self.stdout.write(
+                        f'{name:16} {label:5}: {len(latencies) / elapsed:7.0f} req/s, '
+                        f'p50 {self.ms(latencies, 50)}, p95 {self.ms(latencies, 95)}')
+
+    def seed(self, courses):
+        tutor = User.objects.create_user(email='tutor@example.com', name='Tutor', password='secret', user_type='teacher')
+        category = Category.objects.create(title='Programming', description='Description')
+        course_ids = []
+        for i in range(courses):
+            course = Course.objects.create(title=f'Course {i}', about='About', tagline='Tagline', tutor=tutor,
+                                           category=category, difficulty='beginner', price=10)
+            for j in range(3):
+                lesson = Lesson.objects.create(title=f'Lesson {i}.{j}', course=course, description='Description',
+                                               videoURL='https://example.com/video', duration=10)
+                course.lessons.add(lesson)
+            course_ids.append(course.id)
+        return course_ids, str(RefreshToken.for_user(tutor).access_token)
+
+    async def client_loop(self, urls, token, count, offset):
+        client = AsyncClient()
+        latencies = []
+        for i in range(count):
+            url = urls[(offset + i) % len(urls)]
+            start = time.perf_counter()
+            response = await client.get(url, AUTHORIZATION=f'Bearer {token}')
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, (url, response.status_code)
+        return latencies
+
+    async def run(self, urls, token, clients, requests):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.client_loop(urls, token, requests, i) for i in range(clients)))
+        return [latency for result in results for latency in result], time.perf_counter() - start
+
+    @staticmethod
+    def ms(latencies, percentile):
+        return f'{statistics.quantiles(latencies, n=100)[percentile - 1] * 1000:6.1f}ms'
@@ -0,0 +1,103 @@
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from account.autocomplete import normalize, prefix_index
+from account.models import Category, Course, User
+
+from ._benchmark import benchmark_database
+
+Enrollment = User.enrolled_courses.through
+
+
+class Command(BaseCommand):
+    help = ('Time course title autocomplete from the in-memory prefix index against an '
+            'icontains query, replaying keystrokes over a throwaway database of synthetic courses.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100000)
+        parser.add_argument('--enrollments', type=int, default=200000)
+        parser.add_argument('--sessions', type=int, default=2000, help='Typed queries to replay.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            titles = self.seed(options['courses'], options['enrollments'])
+            start = time.perf_counter()
+            prefix_index.rebuild()
+            self.stdout.write(f'Built the index in {time.perf_counter() - start:.2f} s')
+
+            keystrokes = self.keystrokes(titles, options['sessions'])
+            self.stdout.write(f'Replaying {len(keystrokes)} keystrokes')
+            first = self.latencies(prefix_index.complete, keystrokes)
+            again = self.latencies(prefix_index.complete, keystrokes)
+            self.report('prefix index, first pass', first)
+            self.report('prefix index, repeated', again)
+
+            def icontains(query):
+                return list(Course.objects.filter(is_visible=True, title__icontains=query)
+                            .values('id', 'title')[:prefix_index.limit])
+            self.report('icontains', self.latencies(icontains, keystrokes[:200]))
+
+    def seed(self, count, enrollments):
+        self.stdout.write(f'Loading {count} synthetic courses...')
+        rng = random.Random(0)
+        # Title words with a long-tailed frequency, like real titles
+        vocabulary = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(20000)]
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        tutor = User.objects.create_user(email='tutor@example.com', name='Tutor', password='secret', user_type='teacher')
+        category = Category.objects.create(title='Programming', description='Description')
+        titles = [f'{" ".join(rng.choices(vocabulary, weights=weights, k=rng.randint(2, 6)))} {i}' for i in range(count)]
+        Course.objects.bulk_create([
+            Course(title=title, tutor=tutor, about='About', tagline='Tagline', category=category, price=10)
+            for title in titles
+        ], batch_size=2000)
+
+        User.objects.bulk_create([
+            User(email=f'student{i}@example.com', name=f'Student {i}', phone='0', user_type='student', password='!')
+            for i in range(2000)
+        ], batch_size=2000)
+        course_ids = list(Course.objects.values_list('id', flat=True))
+        student_ids = list(User.objects.filter(user_type='student').values_list('id', flat=True))
+        pairs = {(rng.choice(student_ids), int(rng.paretovariate(1.2)) % len(course_ids)) for _ in range(enrollments)}
+        Enrollment.objects.bulk_create([
+            Enrollment(user_id=user_id, course_id=course_ids[index]) for user_id, index in pairs
+        ], batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return titles
+
+    @staticmethod
+    def keystrokes(titles, sessions):
+        """
+        Every prefix typed while entering one or two words of random titles.
+        """
+        rng = random.Random(1)
+        queries = []
+        for _ in range(sessions):
+            words = normalize(rng.choice(titles))[:rng.randint(1, 2)]
+            typed = ' '.join(words)
+            queries.extend(typed[:length] for length in range(1, len(typed) + 1) if not typed[:length].endswith(' '))
+        return queries
+
+    @staticmethod
+    def latencies(func, queries):
+        result = []
+        for query in queries:
+            start = time.perf_counter()
+            func(query)
+            result.append(time.perf_counter() - start)
+        return result
+
+    def report(self, label, latencies):
+        latencies = sorted(latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+
+        self.stdout.write(
+            f'{label:26}: p50 {percentile(50):7.3f} ms, p99 {percentile(99):7.3f} ms, '
+            f'max {latencies[-1] * 1000:7.3f} ms, mean {statistics.mean(latencies) * 1000:7.3f} ms')
@@ -0,0 +1,83 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.test.utils import override_settings
+
+from account.models import Category, Course, User
+from account.password_utils import hashing_executor
+
+from ._benchmark import benchmark_database
+
+PASSWORD = 'storm-password'
+
+
+class Command(BaseCommand):
+    help = ('Measure catalog latency while a burst of logins is in flight, with the '
+            'sync login view and with the async one backed by the hashing executor.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Clients logging in back to back for the whole run.')
+        parser.add_argument('--catalog-requests', type=int, default=40)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed()
+            for label, urlconf in (('sync', 'djangoauthapi1.urls'), ('async', 'djangoauthapi1.asgi_urls')):
+                with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=['testserver']):
+                    idle = asyncio.run(self.catalog_latencies(options['catalog_requests']))
+                    storm, logins, elapsed = asyncio.run(
+                        self.storm(options['concurrency'], options['catalog_requests']))
+                self.stdout.write(
+                    f'{label:5} login view: catalog p50 {self.ms(idle, 50)} idle, during the storm '
+                    f'p50 {self.ms(storm, 50)} p95 {self.ms(storm, 95)} max {max(storm) * 1000:7.1f}ms; '
+                    f'{logins / elapsed:.1f} logins/s')
+        self.stdout.write(f'hashing executor: {hashing_executor.stats()}')
+
+    def seed(self):
+        User.objects.create_user(email='storm@example.com', name='Storm', password=PASSWORD, user_type='student')
+        tutor = User.objects.create_user(email='tutor@example.com', name='Tutor', password=PASSWORD, user_type='teacher')
+        category = Category.objects.create(title='Programming')
+        for i in range(20):
+            Course.objects.create(title=f'Course {i}', about='About', tagline='Tagline', tutor=tutor,
+                                  category=category, difficulty='beginner', price=10)
+
+    async def catalog_latencies(self, count):
+        client = AsyncClient()
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.get('/api/categories/')
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        return latencies
+
+    async def login_loop(self, done):
+        client = AsyncClient()
+        logins = 0
+        while not done.is_set():
+            response = await client.post(
+                '/api/auth/signin/', {'email': 'storm@example.com', 'password': PASSWORD},
+                content_type='application/json')
+            assert response.status_code == 200, response.status_code
+            logins += 1
+        return logins
+
+    async def storm(self, concurrency, catalog_requests):
+        done = asyncio.Event()
+        start = time.perf_counter()
+        clients = asyncio.gather(*(self.login_loop(done) for _ in range(concurrency)))
+        # Let the burst get in flight before timing the catalog
+        await asyncio.sleep(0.2)
+        latencies = await self.catalog_latencies(catalog_requests)
+        done.set()
+        logins = sum(await clients)
+        return latencies, logins, time.perf_counter() - start
+
+    @staticmethod
+    def ms(latencies, percentile):
+        value = statistics.quantiles(latencies, n=100)[percentile - 1] if len(latencies) > 1 else latencies[0]
+        return f'{value * 1000:7.1f}ms'
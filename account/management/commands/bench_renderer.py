@@ -0,0 +1,82 @@
+import json
+import time
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.response import Response
+
+from account.renderers import JSON_BACKENDS, UserRenderer, get_json_backend
+
+
+def legacy_render(data):
+    # The renderer as it was: a full str() scan followed by json.dumps
+    if 'ErrorDetail' in str(data):
+        return json.dumps({'errors': data})
+    return json.dumps(data)
+
+
+def course_payload(courses, lessons):
+    return [
+        OrderedDict([
+            ('id', c), ('title', f'Course {c}'), ('about', 'About this course ' * 20),
+            ('tagline', 'Learn something'), ('tutor', 1), ('category', 'Programming'),
+            ('difficulty', 'beginner'), ('thumbnail', 'A' * 2000), ('price', '49.99'),
+            ('is_visible', True),
+            ('lessons', [
+                OrderedDict([
+                    ('id', c * lessons + l), ('title', f'Lesson {l}'), ('course', c),
+                    ('description', 'Lesson description ' * 10),
+                    ('videoURL', 'https://example.com/video.mp4'), ('duration', 600),
+                    ('order', l), ('likes', list(range(20))),
+                    ('comments', [OrderedDict([('user', 1), ('content', 'Great lesson!'),
+                                               ('createdAt', '2024-01-01T00:00:00Z')])] * 5),
+                    ('reports', []),
+                    ('created_at', '2024-01-01T00:00:00Z'), ('updated_at', '2024-01-01T00:00:00Z'),
+                ])
+                for l in range(lessons)
+            ]),
+            ('created_at', '2024-01-01T00:00:00Z'), ('updated_at', '2024-01-01T00:00:00Z'),
+        ])
+        for c in range(courses)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compare UserRenderer against the legacy str()-scanning renderer on a large course payload.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=200)
+        parser.add_argument('--lessons', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        data = course_payload(options['courses'], options['lessons'])
+        repeat = options['repeat']
+        legacy = legacy_render(data).encode('utf-8')
+        self.stdout.write(f'Payload: {len(legacy) / 1024:.0f} KiB, {repeat} renders each')
+
+        baseline = self.time(lambda: legacy_render(data), repeat)
+        self.stdout.write(f'legacy (str scan + json.dumps): {baseline * 1000:8.2f} ms/render')
+
+        renderer = UserRenderer()
+        context = {'response': Response(data, status=200)}
+        for name in JSON_BACKENDS:
+            if get_json_backend(name) is not JSON_BACKENDS[name]:
+                self.stdout.write(f'{name}: not installed, skipped')
+                continue
+            with override_settings(USER_RENDERER_JSON_BACKEND=name):
+                output = renderer.render(data, renderer_context=context)
+                elapsed = self.time(lambda: renderer.render(data, renderer_context=context), repeat)
+            identical = 'byte-identical' if output == legacy else 'compact output'
+            self.stdout.write(
+                f'UserRenderer[{name}]: {elapsed * 1000:8.2f} ms/render '
+                f'({baseline / elapsed:.1f}x, {identical})')
+
+    @staticmethod
+    def time(func, repeat):
+        func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat
@@ -0,0 +1,87 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from account.models import Category, Course, User
+from account.search import SearchResults, rebuild_search_index, search_enabled
+
+from ._benchmark import benchmark_database
+
+TOPICS = ['python', 'django', 'javascript', 'react', 'design', 'marketing', 'finance', 'photography',
+          'machine', 'learning', 'statistics', 'guitar', 'cooking', 'spanish', 'excel', 'kubernetes']
+QUERIES = ['python', 'django python', 'kuber', 'machine learning', 'zzzz']
+
+
+class Command(BaseCommand):
+    help = ('Compare the full-text search index with icontains scans over the course '
+            'columns, on a throwaway database of synthetic courses.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError('Search needs the SQLite database')
+        with benchmark_database():
+            self.seed(options['courses'])
+            start = time.perf_counter()
+            count = rebuild_search_index()
+            self.stdout.write(f'Indexed {count} rows in {time.perf_counter() - start:.1f} s')
+
+            page_size = options['page_size']
+            for query in QUERIES:
+                def fts():
+                    results = SearchResults(query, kind='course')
+                    return results.count(), results[:page_size]
+
+                def icontains():
+                    condition = Q()
+                    for term in query.split():
+                        condition &= Q(title__icontains=term) | Q(tagline__icontains=term) | Q(about__icontains=term)
+                    courses = Course.objects.filter(condition)
+                    return courses.count(), list(courses.values('id', 'title')[:page_size])
+
+                (fts_count, _), fts_time = self.time(fts, options['repeat'])
+                (scan_count, _), scan_time = self.time(icontains, options['repeat'])
+                self.stdout.write(self.style.MIGRATE_HEADING(f'q={query!r}'))
+                self.stdout.write(f'  icontains {scan_time * 1000:9.2f} ms  {scan_count} matches')
+                self.stdout.write(f'  fts5      {fts_time * 1000:9.2f} ms  {fts_count} matches, ranked')
+                self.stdout.write(f'  {scan_time / fts_time:.1f}x faster')
+
+    @staticmethod
+    def time(func, repeat):
+        result = func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return result, (time.perf_counter() - start) / repeat
+
+    def seed(self, count):
+        self.stdout.write(f'Loading {count} synthetic courses...')
+        rng = random.Random(0)
+        # Filler words with a long-tailed frequency, like real text
+        filler = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+        weights = [1 / rank for rank in range(1, len(filler) + 1)]
+
+        def text(words):
+            chosen = rng.choices(filler, weights=weights, k=words)
+            # Sprinkle in topic words, each ending up in a few percent of the courses
+            if rng.random() < 0.3:
+                chosen.insert(rng.randrange(len(chosen) + 1), rng.choice(TOPICS))
+            return ' '.join(chosen)
+
+        tutor = User.objects.create_user(email='tutor@example.com', name='Tutor', password='secret', user_type='teacher')
+        category = Category.objects.create(title='Programming', description='Description')
+        Course.objects.bulk_create([
+            Course(title=f'{text(4)} {i}', tutor=tutor, about=text(120), tagline=text(8),
+                   category=category, price=10)
+            for i in range(count)
+        ], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,188 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.db.models import Sum
+from django.utils import timezone
+
+from account.models import Category, Course, Lesson, Order, User
+from account.ordering import spread_keys
+
+from ._benchmark import benchmark_database
+
+
+def hot_queries():
+    """
+    The queries the API runs most, each with the index that serves it and
+    the single-column FK index (if any) that served it before.
+    """
+    now = timezone.now()
+    student = User.objects.filter(user_type='student').order_by('id').values_list('id', flat=True).first()
+    tutor = User.objects.filter(user_type='teacher').order_by('id').values_list('id', flat=True).first()
+    course = Course.objects.order_by('id').values_list('id', flat=True).first()
+    return [
+        ('course_prices: orders in a date range',
+         Order.objects.filter(created_at__gte=now - timedelta(days=7), created_at__lt=now)
+         .values('course').annotate(total=Sum('price')),
+         Order, 'order_created_id_idx', None),
+        ('orders of a user for a course',
+         Order.objects.filter(user_id=student, course_id=course),
+         Order, 'order_user_course_idx', ['user']),
+        ('TutorViewSet: tutors, newest first',
+         User.objects.filter(user_type='teacher').order_by('-created_at', '-id')[:20],
+         User, 'user_type_created_id_idx', None),
+        ('TutorCourseViewSet: a tutor\'s courses, newest first',
+         Course.objects.filter(tutor_id=tutor).order_by('-created_at', '-id')[:20],
+         Course, 'course_tutor_created_id_idx', ['tutor']),
+        ('lessons of a course in order',
+         Lesson.objects.filter(course_id=course).order_by('order_key', 'id'),
+         Lesson, 'lesson_course_key_id_idx', ['course']),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the query plan of each hot query. With --benchmark, load a synthetic '
+        'dataset into a throwaway database and time each query with and without its index.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', action='store_true')
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--courses', type=int, default=5000)
+        parser.add_argument('--lessons', type=int, default=100000)
+        parser.add_argument('--orders', type=int, default=300000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not options['benchmark']:
+            for name, queryset, *_ in hot_queries():
+                self.explain(name, queryset)
+            return
+
+        with benchmark_database():
+            self.seed(options)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            for name, queryset, model, index_name, replaced in hot_queries():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(f'  {queryset.query}')
+                with_index = self.time(queryset, options['repeat'])
+                with_plan = queryset.explain()
+                with self.without_index(model, index_name, replaced):
+                    without_index = self.time(queryset, options['repeat'])
+                    without_plan = queryset.explain()
+                label = 'FK index only' if replaced else 'without'
+                self.stdout.write(f'  {label:28} {without_index * 1000:9.2f} ms  {self.one_line(without_plan)}')
+                self.stdout.write(f'  {index_name:28} {with_index * 1000:9.2f} ms  {self.one_line(with_plan)}')
+                self.stdout.write(f'  {without_index / with_index:.1f}x faster')
+
+    def explain(self, name, queryset):
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(f'  {queryset.query}')
+        for line in queryset.explain().splitlines():
+            self.stdout.write(f'  {line}')
+
+    @staticmethod
+    def one_line(plan):
+        return ' / '.join(line.strip() for line in plan.splitlines())
+
+    @staticmethod
+    def time(queryset, repeat):
+        list(queryset.all())
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        return (time.perf_counter() - start) / repeat
+
+    @contextmanager
+    def without_index(self, model, index_name, replaced):
+        """
+        Swap the index out for the FK index it replaced (if any) for the
+        duration of the block.
+        """
+        index = next((index for index in model._meta.indexes if index.name == index_name), None)
+        if index is None:
+            raise CommandError(f'{model.__name__} has no index named {index_name}')
+        fallback = models.Index(fields=replaced, name='bench_fk_idx') if replaced else None
+        with connection.schema_editor() as editor:
+            editor.remove_index(model, index)
+            if fallback:
+                editor.add_index(model, fallback)
+        self.analyze()
+        try:
+            yield
+        finally:
+            with connection.schema_editor() as editor:
+                if fallback:
+                    editor.remove_index(model, fallback)
+                editor.add_index(model, index)
+            self.analyze()
+
+    @staticmethod
+    def analyze():
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def seed(self, options):
+        rng = random.Random(0)
+        now = timezone.now()
+        self.stdout.write('Loading the synthetic dataset...')
+
+        def created(days=365):
+            return now - timedelta(seconds=rng.randrange(days * 24 * 3600))
+
+        User.objects.bulk_create([
+            User(email=f'user{i}@example.com', name=f'User {i}', phone='0',
+                 user_type='teacher' if i % 20 == 0 else 'student', password='!')
+            for i in range(options['users'])
+        ], batch_size=2000)
+        user_ids = list(User.objects.values_list('id', flat=True))
+        tutor_ids = list(User.objects.filter(user_type='teacher').values_list('id', flat=True))
+        student_ids = list(User.objects.filter(user_type='student').values_list('id', flat=True))
+        # auto_now_add ignores values passed in, so spread the timestamps afterwards
+        self.spread_created_at(User, user_ids, created)
+
+        # The first tutor, course and student are the busy ones the hot
+        # queries look up, so the per-key row counts are realistic
+        def skewed(ids, share):
+            return ids[0] if rng.random() < share else rng.choice(ids)
+
+        category = Category.objects.create(title='Programming', description='Description')
+        Course.objects.bulk_create([
+            Course(title=f'Course {i}', tutor_id=skewed(tutor_ids, 0.1), about='About', tagline='Tagline',
+                   category=category, price=rng.randrange(10, 200))
+            for i in range(options['courses'])
+        ], batch_size=2000)
+        courses = dict(Course.objects.values_list('id', 'price'))
+        course_ids = list(courses)
+        self.spread_created_at(Course, course_ids, created)
+
+        # bulk_create skips the pre_save signal that assigns order keys
+        order_keys = spread_keys(options['lessons'])
+        rng.shuffle(order_keys)
+        Lesson.objects.bulk_create([
+            Lesson(title=f'Lesson {i}', course_id=skewed(course_ids, 0.02), description='Description',
+                   videoURL='https://example.com/video', duration=600, order=rng.randrange(1000),
+                   order_key=order_key)
+            for i, order_key in enumerate(order_keys)
+        ], batch_size=5000)
+
+        orders = []
+        for _ in range(options['orders']):
+            course_id = skewed(course_ids, 0.02)
+            orders.append(Order(user_id=skewed(student_ids, 0.01), course_id=course_id,
+                                status=Order.COMPLETED, price=courses[course_id]))
+        Order.objects.bulk_create(orders, batch_size=5000)
+        self.spread_created_at(Order, list(Order.objects.values_list('id', flat=True)), created)
+
+    @staticmethod
+    def spread_created_at(model, ids, created):
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {connection.ops.quote_name(table)} SET created_at = %s WHERE id = %s',
+                [(created(), pk) for pk in ids])
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.user_tokens import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete issued tokens that have expired. Run it periodically, e.g. daily from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=0,
+            help='Keep tokens for this many seconds after they expire.')
+
+    def handle(self, *args, **options):
+        count = prune_expired_tokens(timezone.now() - timedelta(seconds=options['grace']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired token(s)'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.db.models.functions import Length
+
+from account.models import Lesson
+from account.ordering import rebalance_course
+
+
+class Command(BaseCommand):
+    help = (
+        'Give the lessons of courses with long order keys short, evenly spread '
+        'keys again, keeping their order. Moves rebalance a course by themselves '
+        'once a key gets too long; run this now and then to keep keys short.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Rebalance only this course.')
+        parser.add_argument(
+            '--longer-than', type=int, default=8,
+            help='Rebalance courses with a key longer than this (default 8); 0 rebalances every course.')
+
+    def handle(self, *args, **options):
+        if options['course'] is not None:
+            course_ids = [options['course']]
+        else:
+            course_ids = (Lesson.objects.order_by().values('course_id')
+                          .annotate(longest=Max(Length('order_key')))
+                          .filter(longest__gt=options['longer_than'])
+                          .values_list('course_id', flat=True))
+        courses = lessons = 0
+        for course_id in course_ids:
+            lessons += rebalance_course(course_id)
+            courses += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebalanced {lessons} lesson(s) in {courses} course(s)'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.revenue import rebuild_revenue_rollup, revenue_rollup_drift
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the revenue rollup table from the orders table. Run it once after '
+        'deploying the rollup, and whenever orders were changed without signals '
+        '(e.g. QuerySet.update() or raw SQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report buckets that drifted from the orders; exit with an error if any did.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = revenue_rollup_drift()
+            for (course_id, day, status), expected, actual in drift:
+                self.stdout.write(
+                    f'course={course_id} day={day} status={status}: '
+                    f'expected total={expected[0]} count={expected[1]}, '
+                    f'found total={actual[0]} count={actual[1]}')
+            if drift:
+                raise CommandError(f'{len(drift)} revenue rollup bucket(s) drifted')
+            self.stdout.write(self.style.SUCCESS('Revenue rollup matches the orders table'))
+            return
+
+        count = rebuild_revenue_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} revenue rollup bucket(s)'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.search import rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the full-text search index from the course and lesson tables, '
+            'e.g. after bulk writes that bypass the model signals.')
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError('Search needs the SQLite database')
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} course(s) and lesson(s)'))
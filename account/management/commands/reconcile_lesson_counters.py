@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.counters import lesson_counter_drift, reconcile_lesson_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Repair the like, comment and report counts of lessons that drifted from '
+        'the rows they count, e.g. after likes, comments or reports were changed '
+        'without signals (QuerySet.update(), bulk_create() or raw SQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report counters that drifted; exit with an error if any did.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = lesson_counter_drift()
+            for lesson_id, field, expected, actual in drift:
+                self.stdout.write(f'lesson={lesson_id} {field}: expected {expected}, found {actual}')
+            if drift:
+                raise CommandError(f'{len(drift)} lesson counter(s) drifted')
+            self.stdout.write(self.style.SUCCESS('Lesson counters match their rows'))
+            return
+
+        count = reconcile_lesson_counters()
+        self.stdout.write(self.style.SUCCESS(f'Repaired the counters of {count} lesson(s)'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from account.tasks import TASK_BATCH_SIZE, run_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background tasks (e.g. outgoing email). Several workers '
+        'can run side by side; each claims its own batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=TASK_BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Seconds to wait before polling again when no task is due.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the tasks that are due now, then exit.')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                count = run_batch(options['batch_size'])
+                total += count
+                if count and options['verbosity'] > 1:
+                    self.stdout.write(f'Ran {count} task(s)')
+                if not count:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} task(s)'))
@@ -0,0 +1,59 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:37
+
+import base64
+
+from django.db import migrations, models
+
+from account.thumbnail_store import decode_thumbnail, get_thumbnail_store, sniff_content_type
+
+
+def extract_thumbnails(apps, schema_editor):
+    Course = apps.get_model('account', 'Course')
+    store = get_thumbnail_store()
+    for course in Course.objects.exclude(thumbnail='').only('id', 'thumbnail').iterator():
+        try:
+            data = decode_thumbnail(course.thumbnail)
+        except ValueError:
+            # Not base64 (e.g. a plain URL); keep the original text as the blob
+            data = course.thumbnail.encode('utf-8')
+        Course.objects.filter(pk=course.pk).update(thumbnail_hash=store.save(data))
+
+
+def restore_thumbnails(apps, schema_editor):
+    Course = apps.get_model('account', 'Course')
+    store = get_thumbnail_store()
+    for course in Course.objects.exclude(thumbnail_hash='').only('id', 'thumbnail_hash').iterator():
+        data = store.read(course.thumbnail_hash)
+        content_type = sniff_content_type(data)
+        if content_type == 'application/octet-stream':
+            # Text that extract_thumbnails could not decode goes back as it was
+            thumbnail = data.decode('utf-8', errors='replace')
+        else:
+            thumbnail = f'data:{content_type};base64,{base64.b64encode(data).decode()}'
+        Course.objects.filter(pk=course.pk).update(thumbnail=thumbnail)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_revenue_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.RunPython(extract_thumbnails, restore_thumbnails),
+        # Give the column a default so that unapplying can add it back
+        migrations.AlterField(
+            model_name='course',
+            name='thumbnail',
+            field=models.CharField(default='', max_length=15000),
+        ),
+        migrations.RemoveField(
+            model_name='course',
+            name='thumbnail',
+        ),
+    ]
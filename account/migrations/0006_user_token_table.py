@@ -0,0 +1,107 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:53
+
+import hashlib
+from datetime import datetime, timezone
+
+import jwt
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def parse_token(value):
+    """
+    Whatever was stored in User.token: an encoded JWT or a dict of claims.
+    :return: (jti, token_type, issued_at, expires_at) or None.
+    """
+    if isinstance(value, str):
+        try:
+            claims = jwt.decode(value, options={'verify_signature': False})
+        except jwt.InvalidTokenError:
+            return None
+        # Tokens without a jti are still kept, identified by their digest
+        claims.setdefault('jti', hashlib.sha256(value.encode('utf-8')).hexdigest())
+    elif isinstance(value, dict):
+        claims = value
+    else:
+        return None
+    if not claims.get('jti') or not claims.get('exp'):
+        return None
+    token_type = claims.get('token_type', 'access')
+    expires_at = datetime.fromtimestamp(int(claims['exp']), tz=timezone.utc)
+    issued_at = datetime.fromtimestamp(int(claims.get('iat', claims['exp'])), tz=timezone.utc)
+    return str(claims['jti']), token_type if token_type in ('access', 'refresh') else 'access', issued_at, expires_at
+
+
+def move_tokens(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    UserToken = apps.get_model('account', 'UserToken')
+    seen = set()
+    rows = []
+    for user in User.objects.exclude(token=[]).exclude(token__isnull=True).only('id', 'token').iterator():
+        tokens = user.token if isinstance(user.token, list) else [user.token]
+        for value in tokens:
+            parsed = parse_token(value)
+            if parsed is None or parsed[0] in seen:
+                continue
+            jti, token_type, issued_at, expires_at = parsed
+            seen.add(jti)
+            rows.append(UserToken(user_id=user.id, jti=jti, token_type=token_type,
+                                  issued_at=issued_at, expires_at=expires_at))
+    UserToken.objects.bulk_create(rows, batch_size=1000)
+
+
+def restore_tokens(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    UserToken = apps.get_model('account', 'UserToken')
+    tokens = {}
+    for token in UserToken.objects.order_by('id').iterator():
+        tokens.setdefault(token.user_id, []).append({
+            'jti': token.jti,
+            'token_type': token.token_type,
+            'iat': int(token.issued_at.timestamp()),
+            'exp': int(token.expires_at.timestamp()),
+        })
+    for user_id, values in tokens.items():
+        User.objects.filter(pk=user_id).update(token=values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True)),
+                ('token_type', models.CharField(choices=[('access', 'Access'), ('refresh', 'Refresh')], max_length=10)),
+                ('issued_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('revoked_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='usertoken',
+            index=models.Index(fields=['user', 'jti', 'expires_at'], name='usertoken_user_jti_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertoken',
+            index=models.Index(fields=['expires_at'], name='usertoken_expires_at_idx'),
+        ),
+        migrations.RunPython(move_tokens, restore_tokens),
+        # Give the column a default so that unapplying can add it back
+        migrations.AlterField(
+            model_name='user',
+            name='token',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='token',
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0006_user_token_table'),
+    ]
+
+    operations = [
+        # Add the composite indexes before dropping the FK indexes they replace
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['tutor', 'created_at', 'id'], name='course_tutor_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'order'], name='lesson_course_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'course'], name='order_user_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['user_type', 'created_at', 'id'], name='user_type_created_id_idx'),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='tutor',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'user_type': 'teacher'}, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='account.course'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
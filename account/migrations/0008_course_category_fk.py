@@ -0,0 +1,66 @@
+# Generated by Django 4.0.3 on 2026-10-18 13:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_categories(apps, schema_editor):
+    """
+    Point each course at the Category whose title matches its old free-text
+    category (ignoring case and surrounding whitespace), creating the
+    categories that don't exist yet. Blank values are left without one.
+    """
+    Category = apps.get_model('account', 'Category')
+    Course = apps.get_model('account', 'Course')
+    categories = {category.title.strip().lower(): category for category in Category.objects.all()}
+    names = Course.objects.values_list('category_name', flat=True).distinct()
+    for name in names:
+        title = (name or '').strip()
+        if not title:
+            continue
+        category = categories.get(title.lower())
+        if category is None:
+            category = categories[title.lower()] = Category.objects.create(title=title, description='')
+        Course.objects.filter(category_name=name).update(category=category)
+
+
+def unlink_categories(apps, schema_editor):
+    Course = apps.get_model('account', 'Course')
+    for course in Course.objects.select_related('category'):
+        course.category_name = course.category.title if course.category else ''
+        course.save(update_fields=['category_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='course',
+            old_name='category',
+            new_name='category_name',
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='category',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='courses', to='account.category'),
+        ),
+        migrations.RunPython(link_categories, unlink_categories),
+        # Lets the reverse migration add the column back to existing rows
+        migrations.AlterField(
+            model_name='course',
+            name='category_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='course',
+            name='category_name',
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='course_category_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:05
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite's; other backends go without search (see account/search.py)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE account_search USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, course_id UNINDEXED, title, tagline, body, "
+        "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO account_search (rowid, kind, object_id, course_id, title, tagline, body) "
+        "SELECT 2 * id, 'course', id, id, title, tagline, about FROM account_course"
+    )
+    schema_editor.execute(
+        "INSERT INTO account_search (rowid, kind, object_id, course_id, title, tagline, body) "
+        "SELECT 2 * id + 1, 'lesson', id, course_id, title, '', description FROM account_lesson"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS account_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0008_course_category_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing(apps, schema_editor):
+    Lesson = apps.get_model('account', 'Lesson')
+    Comment = apps.get_model('account', 'Comment')
+    Report = apps.get_model('account', 'Report')
+    Like = Lesson.likes.through
+
+    def count(model):
+        rows = model.objects.filter(lesson=OuterRef('pk')).order_by().values('lesson').annotate(n=Count('pk'))
+        return Coalesce(Subquery(rows.values('n'), output_field=IntegerField()), 0)
+
+    Lesson.objects.update(like_count=count(Like), comment_count=count(Comment), report_count=count(Report))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='report_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.0.3 on 2026-10-18 12:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0010_lesson_counters'),
+    ]
+
+    operations = [
+        # Add the composite index before dropping the FK index it replaces
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['lesson', 'createdAt', 'id'], name='comment_lesson_created_id_idx'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='lesson',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='account.lesson'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.3 on 2026-10-18 12:44
+
+from django.db import migrations, models
+from django.db.models import F
+
+from account.ordering import spread_keys
+
+
+def assign_order_keys(apps, schema_editor):
+    # Keys follow the old `order` values; unordered lessons go last, oldest first
+    Lesson = apps.get_model('account', 'Lesson')
+    course_ids = Lesson.objects.order_by().values_list('course_id', flat=True).distinct()
+    for course_id in course_ids:
+        lessons = list(Lesson.objects.filter(course_id=course_id)
+                       .order_by(F('order').asc(nulls_last=True), 'id').only('id'))
+        for lesson, key in zip(lessons, spread_keys(len(lessons))):
+            lesson.order_key = key
+        Lesson.objects.bulk_update(lessons, ['order_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0011_comment_lesson_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='order_key',
+            field=models.CharField(default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(assign_order_keys, migrations.RunPython.noop),
+        # Add the new index before dropping the one it replaces
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'order_key', 'id'], name='lesson_course_key_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='lesson',
+            name='lesson_course_order_idx',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser
 
 #  Custom User Manager
@@ -26,10 +27,13 @@ class UserManager(BaseUserManager):
             password=None,
             user_type=None,
             enrolled_courses=None,
+            password_hash=None,
             **extra_fields
     ):
         """
         Creates and saves a User with the given email, name, user_type, and password.
+        Pass `password_hash` instead of `password` when the password has
+        already been hashed (e.g. off the event loop by password_utils).
         """
         if not email:
             raise ValueError('User must have an email address')
@@ -43,7 +47,10 @@ class UserManager(BaseUserManager):
             **extra_fields
         )
 
-        user.set_password(password)
+        if password_hash is not None:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
 
         if enrolled_courses:
@@ -99,13 +106,19 @@ class User(AbstractBaseUser):
     address = models.CharField(max_length=255, blank=True, null=True)
     enrolled_courses = models.ManyToManyField('Course', blank=True)
     is_blocked = models.BooleanField(default=False)
-    token = models.JSONField(default=list,  blank=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name']
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='user_created_id_idx'),
+            # Student/tutor lists, newest first
+            models.Index(fields=['user_type', 'created_at', 'id'], name='user_type_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -125,6 +138,11 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='category_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -134,18 +152,26 @@ class Course(models.Model):
     tutor = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        limit_choices_to={'user_type': 'teacher'}
+        limit_choices_to={'user_type': 'teacher'},
+        db_index=False,  # course_tutor_created_id_idx covers it
     )
     about = models.TextField()
     tagline = models.CharField(max_length=255)
-    category = models.CharField(max_length=255)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='courses',
+        db_index=False,  # course_category_created_id_idx covers it
+    )
     difficulty = models.CharField(
         max_length=20,
         choices=DIFFICULTY,
         blank=True,
         null=True
     )
-    thumbnail = models.CharField(max_length=15000)
+    # sha256 digest of the image in the thumbnail store (see thumbnail_store.py)
+    thumbnail_hash = models.CharField(max_length=64, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     is_visible = models.BooleanField(default=True)
     lessons = models.ManyToManyField(
@@ -153,6 +179,15 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+            # A tutor's courses, newest first
+            models.Index(fields=['tutor', 'created_at', 'id'], name='course_tutor_created_id_idx'),
+            # A category's courses, newest first
+            models.Index(fields=['category', 'created_at', 'id'], name='course_category_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -160,26 +195,47 @@ class Course(models.Model):
 class Lesson(models.Model):
     title = models.CharField(max_length=255)
     course = models.ForeignKey(
-        'Course', on_delete=models.CASCADE)
+        'Course', on_delete=models.CASCADE,
+        db_index=False)  # lesson_course_key_id_idx covers it
     description = models.TextField()
     videoURL = models.CharField(max_length=255)
     duration = models.IntegerField()
     order = models.IntegerField(null=True)
+    # Position in the course; a fraction written in base 36 (see ordering.py)
+    order_key = models.CharField(max_length=32, default='', editable=False)
     likes = models.ManyToManyField(User, related_name='liked_lessons', blank=True)
+    # Kept in step with likes, comments and reports by signals.py (see counters.py)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    report_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='lesson_created_id_idx'),
+            # A course's lessons in order
+            models.Index(fields=['course', 'order_key', 'id'], name='lesson_course_key_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
 class Comment(models.Model):
     lesson = models.ForeignKey(
-        Lesson, related_name='comments', on_delete=models.CASCADE)
+        Lesson, related_name='comments', on_delete=models.CASCADE,
+        db_index=False)  # comment_lesson_created_id_idx covers it
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     createdAt = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A lesson's comments, newest first
+            models.Index(fields=['lesson', 'createdAt', 'id'], name='comment_lesson_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.name}'s comment on {self.lesson.title}"
 
@@ -205,17 +261,111 @@ class Order(models.Model):
         (CANCELLED, 'Cancelled'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # order_user_course_idx covers it
     course = models.ForeignKey('Course', on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            # A user's orders for a course
+            models.Index(fields=['user', 'course'], name='order_user_course_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.user.name} - {self.course.title}"
 
 
+class RevenueRollup(models.Model):
+    """
+    Running order totals per (course, day, status), kept up to date by the
+    Order signals so revenue dashboards never have to scan the orders table.
+    """
+    course = models.ForeignKey(
+        'Course', related_name='revenue_rollups', on_delete=models.CASCADE)
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['course', 'day', 'status'], name='revenue_rollup_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} - {self.day} - {self.status}: {self.total}"
+
+
+
+class Task(models.Model):
+    """
+    A unit of background work, run by `manage.py run_tasks` (see tasks.py).
+    Finished tasks are deleted; failed ones are kept for inspection.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    # A running task whose worker died is claimed again once this passes
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class UserToken(models.Model):
+    """
+    A JWT issued to a user, by its jti. Kept out of the user row so loading
+    and saving users stays cheap however many tokens they were issued;
+    expired rows are removed by `manage.py prune_tokens`.
+    """
+    ACCESS = 'access'
+    REFRESH = 'refresh'
+    TOKEN_TYPE_CHOICES = [
+        (ACCESS, 'Access'),
+        (REFRESH, 'Refresh'),
+    ]
+
+    user = models.ForeignKey(User, related_name='tokens', on_delete=models.CASCADE)
+    jti = models.CharField(max_length=255, unique=True)
+    token_type = models.CharField(max_length=10, choices=TOKEN_TYPE_CHOICES)
+    issued_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'jti', 'expires_at'], name='usertoken_user_jti_exp_idx'),
+            models.Index(fields=['expires_at'], name='usertoken_expires_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token_type} {self.jti} - {self.user_id}"
+
 # class Tutor(models.Model):
 #     name = models.CharField(max_length=255, blank=True, null=True)
 #     email = models.EmailField(unique=True)
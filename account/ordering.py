@@ -0,0 +1,156 @@
+from django.conf import settings
+from django.db import transaction
+
+from .generations import bump_generation
+from .models import Lesson
+
+# Order keys are base 36 fractions: "i" is 18/36, "i9" is 18/36 + 9/36².
+# Comparing keys as strings compares the fractions, so a key between any
+# two others always exists and a move rewrites one row. Digits and
+# lowercase letters sort the same under every database collation.
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+# Appended keys step at this many digits, leaving BASE ** 3 appends
+# between two one-digit keys
+APPEND_WIDTH = 4
+# A course is rebalanced once a move produces a key longer than this
+ORDER_KEY_MAX_LENGTH = getattr(settings, 'ORDER_KEY_MAX_LENGTH', 24)
+
+
+def _strip(key):
+    # A trailing 0 adds nothing to the fraction, and no key may end with
+    # one, so there is always room before a key
+    return key.rstrip(DIGITS[0])
+
+
+def _midpoint(low, high):
+    """
+    A key between `low` ('' for 0) and `high` (None for 1).
+    """
+    if high is not None:
+        # Keep the common prefix, split what follows it
+        common = 0
+        while common < len(high) and (low[common] if common < len(low) else DIGITS[0]) == high[common]:
+            common += 1
+        if common:
+            return high[:common] + _midpoint(low[common:], high[common:])
+    low_digit = DIGITS.index(low[0]) if low else 0
+    high_digit = DIGITS.index(high[0]) if high is not None else BASE
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit + 1) // 2]
+    if high is not None and len(high) > 1:
+        # high is just above its first digit: that digit alone is between
+        return high[:1]
+    return DIGITS[low_digit] + _midpoint(low[1:], None)
+
+
+def key_after(key):
+    """
+    A short key after `key` (None for the start), for appending.
+    """
+    if key is None:
+        return key_between(None, None)
+    digits = [DIGITS.index(digit) for digit in key.ljust(APPEND_WIDTH, DIGITS[0])]
+    for position in reversed(range(len(digits))):
+        if digits[position] < BASE - 1:
+            digits[position] += 1
+            return _strip(''.join(DIGITS[digit] for digit in digits[:position + 1]))
+    # All z: only longer keys come after it
+    return key + _midpoint('', None)
+
+
+def key_between(low, high):
+    """
+    A key sorting strictly between two keys.
+    :param low: The key before, or None for the start.
+    :param high: The key after, or None for the end.
+    :return: The new key.
+    """
+    if low is not None and high is not None and low >= high:
+        raise ValueError(f'{low!r} is not before {high!r}')
+    return _midpoint(low or '', high)
+
+
+def keys_after(key, count):
+    """
+    `count` ascending keys after `key` (None for the start).
+    """
+    keys = []
+    for _ in range(count):
+        key = key_after(key)
+        keys.append(key)
+    return keys
+
+
+def spread_keys(count):
+    """
+    `count` ascending keys of equal length spread over the first half of
+    the key space, leaving the rest for appends.
+    """
+    width = 1
+    while BASE ** width < 2 * (count + 1):
+        width += 1
+    step = BASE ** width // (2 * (count + 1))
+    keys = []
+    for position in range(1, count + 1):
+        value, digits = position * step, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append(_strip(''.join(reversed(digits))))
+    return keys
+
+
+def last_key(course_id):
+    return (Lesson.objects.filter(course_id=course_id).order_by('-order_key')
+            .values_list('order_key', flat=True).first())
+
+
+def rebalance_course(course_id):
+    """
+    Give a course's lessons short, evenly spread keys in their current
+    order; run when keys get long (see move_lesson) or collide.
+    :return: The number of lessons rekeyed.
+    """
+    lessons = list(Lesson.objects.filter(course_id=course_id).order_by('order_key', 'id').only('id', 'order_key'))
+    for lesson, key in zip(lessons, spread_keys(len(lessons))):
+        lesson.order_key = key
+    Lesson.objects.bulk_update(lessons, ['order_key'], batch_size=500)
+    transaction.on_commit(lambda: bump_generation(Lesson))
+    return len(lessons)
+
+
+def _neighbour_keys(lesson, after, before):
+    siblings = Lesson.objects.filter(course_id=lesson.course_id).exclude(pk=lesson.pk)
+    if after is not None:
+        high = (siblings.exclude(pk=after.pk).filter(order_key__gte=after.order_key).order_by('order_key')
+                .values_list('order_key', flat=True).first())
+        return after.order_key, high
+    if before is not None:
+        low = (siblings.exclude(pk=before.pk).filter(order_key__lte=before.order_key).order_by('-order_key')
+               .values_list('order_key', flat=True).first())
+        return low, before.order_key
+    return siblings.order_by('-order_key').values_list('order_key', flat=True).first(), None
+
+
+@transaction.atomic
+def move_lesson(lesson, after=None, before=None):
+    """
+    Move a lesson right after `after`, right before `before`, or to the
+    end of its course if neither is given. Only the lesson's row is
+    written, unless its new key is long enough to rebalance the course.
+    """
+    low, high = _neighbour_keys(lesson, after, before)
+    if low is not None and low == high:
+        # Concurrent appends can give two lessons the same key
+        rebalance_course(lesson.course_id)
+        for anchor in (after, before):
+            if anchor is not None:
+                anchor.refresh_from_db(fields=['order_key'])
+        low, high = _neighbour_keys(lesson, after, before)
+    lesson.order_key = key_between(low, high)
+    lesson.save(update_fields=['order_key', 'updated_at'])
+    if len(lesson.order_key) > ORDER_KEY_MAX_LENGTH:
+        rebalance_course(lesson.course_id)
+        lesson.refresh_from_db(fields=['order_key'])
+    return lesson
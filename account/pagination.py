@@ -0,0 +1,33 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    Each page is fetched with a `WHERE created_at < cursor` seek on the
+    (created_at, id) index instead of an OFFSET scan, so page N costs the
+    same as page 1. `id` breaks ties between rows created in the same instant.
+    Clients may ask for a different page size with `?page_size=`.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'MAX_PAGE_SIZE', 100)
+
+
+class CommentCursorPagination(CreatedAtCursorPagination):
+    """
+    A lesson's comments, newest first, seeking on the
+    (lesson, createdAt, id) index.
+    """
+    ordering = ('-createdAt', '-id')
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Numbered pages for ranked search results, which have no stable key to
+    seek on. `?page_size=` works as for the cursor paginated lists.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'MAX_PAGE_SIZE', 100)
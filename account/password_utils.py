@@ -1,4 +1,86 @@
-import bcrypt
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from .AppError_util import AppError
+
+PASSWORD_HASHER_WORKERS = getattr(settings, 'PASSWORD_HASHER_WORKERS', min(4, os.cpu_count() or 1))
+PASSWORD_HASHER_MAX_PENDING = getattr(settings, 'PASSWORD_HASHER_MAX_PENDING', 256)
+
+
+class HashingExecutor:
+    """
+    Bounded thread pool for password hashing. hashlib releases the GIL while
+    it runs PBKDF2, so hashing in these threads leaves the event loop free
+    to keep serving other requests. Once `max_pending` jobs are queued or
+    running, new ones are rejected with a 503 instead of piling up.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hasher')
+            return self._executor
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) on the pool and wait for the result.
+        :raises AppError: (503) If the queue is full.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise AppError.busy('Too many password checks in progress, please retry')
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, func, args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def _call(self, func, args):
+        with self._lock:
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'running': self.running,
+                'queued': self.pending - self.running,
+                'peak_pending': self.peak_pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+hashing_executor = HashingExecutor(PASSWORD_HASHER_WORKERS, PASSWORD_HASHER_MAX_PENDING)
+
 
 async def compare_passwords(plain_text_password, hashed_password):
     """
@@ -7,7 +89,7 @@ async def compare_passwords(plain_text_password, hashed_password):
     :param hashed_password: The hashed password to compare against.
     :return: True if the passwords match, False otherwise.
     """
-    return bcrypt.checkpw(plain_text_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return await hashing_executor.run(check_password, plain_text_password, hashed_password)
 
 async def create_hashed_password(plain_text_password):
     """
@@ -15,5 +97,22 @@ async def create_hashed_password(plain_text_password):
     :param plain_text_password: The plain text password to hash.
     :return: The hashed password.
     """
-    hashed_password = bcrypt.hashpw(plain_text_password.encode('utf-8'), bcrypt.gensalt())
-    return hashed_password.decode('utf-8')
+    return await hashing_executor.run(make_password, plain_text_password)
+
+async def authenticate_user(email, password):
+    """
+    Async counterpart of django.contrib.auth.authenticate() for email logins.
+    :param email: The user's email address.
+    :param password: The plain text password.
+    :return: The user if the credentials are valid and the user is active, else None.
+    """
+    from .models import User
+
+    user = await sync_to_async(User.objects.filter(email=email).first)()
+    if user is None:
+        # Hash anyway so unknown emails take as long as wrong passwords
+        await create_hashed_password(password)
+        return None
+    if not await compare_passwords(password, user.password):
+        return None
+    return user if user.is_active else None
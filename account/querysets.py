@@ -0,0 +1,130 @@
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+
+from .models import Course, Lesson, Report, User
+
+
+def _selects(selection, name):
+    return selection is None or name in selection
+
+
+def lesson_prefetches(prefix='', selection=None):
+    """
+    Prefetch objects for everything LessonSerializer embeds.
+    :param prefix: Relation path leading to the lessons, e.g. 'lessons__'.
+    :param selection: The lesson FieldSelection; relations it leaves out are not prefetched.
+    :return: A list of Prefetch objects.
+    """
+    prefetches = []
+    if _selects(selection, 'reports'):
+        prefetches.append(Prefetch(prefix + 'reports', queryset=Report.objects.order_by('id')))
+    if _selects(selection, 'likes'):
+        # Only the ids are serialized, so don't drag whole user rows along
+        prefetches.append(Prefetch(prefix + 'likes', queryset=User.objects.only('id')))
+    return prefetches
+
+
+def optimized_lessons(queryset=None, selection=None):
+    """
+    Lessons with their reports and likes loaded in a fixed
+    number of queries, however many lessons there are.
+    :param queryset: The lesson queryset to optimize (defaults to all lessons).
+    :param selection: The FieldSelection being rendered, or None for every field.
+    :return: The optimized queryset.
+    """
+    if queryset is None:
+        queryset = Lesson.objects.all()
+    if selection is not None:
+        queryset = queryset.only(*selection.model_fields())
+    return queryset.prefetch_related(*lesson_prefetches(selection=selection))
+
+
+def optimized_courses(queryset=None, selection=None):
+    """
+    Courses with their nested lessons (and everything the lessons embed)
+    loaded in a fixed number of queries, however many courses there are.
+    :param queryset: The course queryset to optimize (defaults to all courses).
+    :param selection: The FieldSelection being rendered, or None for every field.
+    :return: The optimized queryset.
+    """
+    if queryset is None:
+        queryset = Course.objects.all()
+    if selection is not None:
+        queryset = queryset.only(*selection.model_fields())
+    if _selects(selection, 'category'):
+        queryset = queryset.select_related('category')
+    if _selects(selection, 'lessons'):
+        lesson_selection = selection.child('lessons') if selection is not None else None
+        queryset = queryset.prefetch_related(
+            Prefetch('lessons', queryset=optimized_lessons(selection=lesson_selection).order_by('order_key', 'id')),
+        )
+    return queryset
+
+
+def _query_param_list(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return [item for item in value.split(',') if item.strip()]
+
+
+class OptimizedQuerysetMixin:
+    """
+    Runs the viewset queryset through an optimizer before it is used, so
+    list, retrieve and custom actions never fall back to per-row queries.
+
+    Read requests may pick fields with `?fields=a,b,nested.c` or add
+    fields to the defaults with `?expand=nested,nested.c`; actions listed
+    in `compact_actions` default to the serializer's Meta.list_fields. The
+    selection trims both the serialized output and the columns and
+    prefetches the queryset loads.
+    """
+    queryset_optimizer = None
+    compact_actions = ('list',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return self.optimize_queryset(queryset)
+
+    def optimize_queryset(self, queryset):
+        if self.queryset_optimizer is None:
+            return queryset
+        return self.queryset_optimizer(queryset, selection=self.get_field_selection())
+
+    def get_field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = self.build_field_selection()
+        return self._field_selection
+
+    def build_field_selection(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, 'field_selection'):
+            return None
+        selection = serializer_class.field_selection(
+            _query_param_list(request, 'fields') or None,
+            _query_param_list(request, 'expand') or (),
+            compact=self.action in self.compact_actions,
+        )
+        # Keep the pagination ordering columns loaded for building cursors
+        ordering = self.pagination_ordering() or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        selection.required = [field.lstrip('-') for field in ordering]
+        return selection
+
+    def pagination_ordering(self):
+        # A filter backend with get_ordering() overrides the paginator's
+        # ordering, as in CursorPagination.get_ordering()
+        for backend in getattr(self, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                return backend().get_ordering(self.request, None, self)
+        return getattr(self.paginator, 'ordering', None)
+
+    def get_serializer(self, *args, **kwargs):
+        selection = self.get_field_selection()
+        if selection is not None:
+            kwargs.setdefault('fields', selection)
+        return super().get_serializer(*args, **kwargs)
@@ -1,13 +1,84 @@
 from rest_framework import renderers
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.utils.encoders import JSONEncoder
+from django.conf import settings
+from django.utils.module_loading import import_string
+from functools import lru_cache
 import json
 
+
+# DRF's encoder: Decimal, datetime, date, time, timedelta, UUID, ...
+_encoder = JSONEncoder()
+
+
+def stdlib_dumps(data):
+  return json.dumps(data, cls=JSONEncoder).encode('utf-8')
+
+
+def orjson_dumps(data):
+  # Compact separators and raw UTF-8, so not byte-identical to stdlib, but
+  # the same JSON: UTC datetimes end in Z as with DRF's encoder, and types
+  # orjson doesn't know (Decimal, timedelta) go through that encoder
+  import orjson
+  return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+JSON_BACKENDS = {
+  'json': stdlib_dumps,
+  'orjson': orjson_dumps,
+}
+
+
+@lru_cache(maxsize=None)
+def get_json_backend(name):
+  """
+  Resolve a JSON backend by name ('json', 'orjson') or dotted path.
+  Falls back to the stdlib encoder when the backend is not installed.
+  """
+  try:
+    backend = JSON_BACKENDS[name] if name in JSON_BACKENDS else import_string(name)
+    if backend is orjson_dumps:
+      import orjson  # noqa
+    return backend
+  except ImportError:
+    return stdlib_dumps
+
+
+def contains_error_detail(data):
+  """
+  Walk a payload looking for ErrorDetail values, stopping at the first one.
+  """
+  stack = [data]
+  while stack:
+    item = stack.pop()
+    if isinstance(item, ErrorDetail):
+      return True
+    if isinstance(item, dict):
+      stack.extend(item.values())
+    elif isinstance(item, (list, tuple)):
+      stack.extend(item)
+  return False
+
+
 class UserRenderer(renderers.JSONRenderer):
   charset='utf-8'
+
   def render(self, data, accepted_media_type=None, renderer_context=None):
-    response = ''
-    if 'ErrorDetail' in str(data):
-      response = json.dumps({'errors':data})
-    else:
-      response = json.dumps(data)
-    
-    return response
\ No newline at end of file
+    if self.is_error(data, renderer_context):
+      data = {'errors': data}
+    dumps = get_json_backend(getattr(settings, 'USER_RENDERER_JSON_BACKEND', 'json'))
+    try:
+      return dumps(data)
+    except TypeError:
+      # Types the fast backend can't encode still get the stdlib's chance
+      if dumps is stdlib_dumps:
+        raise
+      return stdlib_dumps(data)
+
+  def is_error(self, data, renderer_context):
+    # Successful responses never carry validation errors, so only error
+    # responses (or renders outside a response) need to be inspected
+    response = (renderer_context or {}).get('response')
+    if response is not None and response.status_code < 400:
+      return False
+    return contains_error_detail(data)
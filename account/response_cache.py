@@ -0,0 +1,129 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .generations import get_generations
+
+RESPONSE_CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 5 * 60)
+
+HITS_KEY = 'response-cache:hits'
+MISSES_KEY = 'response-cache:misses'
+
+
+def get_response_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def _count(key):
+    cache = get_response_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def response_cache_stats():
+    """
+    Hit/miss counters of the response cache since the counters were last reset.
+    """
+    cache = get_response_cache()
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+    }
+
+
+def reset_response_cache_stats():
+    get_response_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def response_cache_key(view_name, action, uri, media_type, models):
+    parts = [view_name, action, uri, media_type, *get_generations(models)]
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'response:{digest}'
+
+
+def get_cached_entry(key):
+    """
+    The cached rendering stored under `key`, or None, counting the lookup
+    as a hit only when there is one (misses are counted by the view that
+    goes on to render the response).
+    """
+    entry = get_response_cache().get(key)
+    if entry is not None:
+        _count(HITS_KEY)
+    return entry
+
+
+def cached_entry_response(request, entry):
+    """
+    Build the response for a cache entry, answering conditional requests
+    with 304 when the stored validators match.
+    """
+    content, content_type, etag, last_modified = entry
+    response = get_conditional_response(
+        request, etag=etag, last_modified=parse_http_date_safe(last_modified or ''))
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = last_modified
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Serves list/retrieve from rendered bytes kept in the cache.
+
+    Keys include the generation counter of every model in `cache_models`,
+    which signals.py bumps on post_save/post_delete/m2m_changed, so any
+    change to those rows moves readers on to fresh keys and the stale
+    entries simply expire. Only JSON renderings of 200 responses are
+    stored, along with their validators, so a hit can answer conditional
+    requests without touching the database.
+    """
+    cache_models = ()
+    cached_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+    def cached_response(self, request, get_response):
+        if self.action not in self.cached_actions or request.accepted_renderer.format != 'json':
+            return get_response()
+
+        key = self.response_cache_key(request)
+        entry = get_cached_entry(key)
+        if entry is not None:
+            return cached_entry_response(request._request, entry)
+
+        _count(MISSES_KEY)
+        response = get_response()
+        if response.status_code == 200:
+            def store(rendered):
+                entry = (rendered.content, rendered['Content-Type'],
+                         rendered.get('ETag'), rendered.get('Last-Modified'))
+                get_response_cache().set(key, entry, RESPONSE_CACHE_TIMEOUT)
+            response.add_post_render_callback(store)
+        return response
+
+    def response_cache_key(self, request):
+        return response_cache_key(
+            type(self).__name__, self.action, request.build_absolute_uri(),
+            request.accepted_media_type, self.cache_models)
@@ -0,0 +1,200 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, RevenueRollup
+
+BUCKET_FUNCTIONS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def parse_range_bound(value, end=False):
+    """
+    Parse a `from`/`to` query parameter into an aware datetime.
+    :param value: An ISO 8601 date or datetime string.
+    :param end: If True, a bare date means the start of the following day,
+                so `to=2024-01-31` includes the whole of January 31st.
+    :return: The parsed datetime, or None if the value is empty.
+    :raises ValueError: If the value is not a valid date or datetime.
+    """
+    if not value:
+        return None
+    # Dates first: parse_datetime also accepts a bare date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, time.min)
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'Invalid date: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def rollup_day(created_at):
+    """
+    The rollup day an order falls into, matching TruncDate in the current timezone.
+    """
+    return timezone.localtime(created_at).date()
+
+
+def apply_to_rollup(course_id, created_at, status, price, sign=1):
+    """
+    Atomically add (sign=1) or remove (sign=-1) one order from its rollup bucket.
+    :param course_id: The id of the ordered course.
+    :param created_at: When the order was created.
+    :param status: The order status.
+    :param price: The order price.
+    :param sign: 1 to add the order to the bucket, -1 to remove it.
+    """
+    day = rollup_day(created_at)
+    amount = sign * Decimal(price)
+    with transaction.atomic():
+        if sign > 0:
+            RevenueRollup.objects.get_or_create(course_id=course_id, day=day, status=status)
+        RevenueRollup.objects.filter(course_id=course_id, day=day, status=status).update(
+            total=F('total') + amount,
+            order_count=F('order_count') + sign,
+        )
+
+
+def order_rollup_rows():
+    """
+    Rollup buckets computed from scratch from the orders table.
+    :return: A dict mapping (course_id, day, status) to (total, order_count).
+    """
+    rows = (
+        Order.objects
+        .annotate(day=TruncDate('created_at'))
+        .values('course_id', 'day', 'status')
+        .annotate(total=Sum('price'), order_count=Count('id'))
+        .order_by()
+    )
+    return {
+        (row['course_id'], row['day'], row['status']): (row['total'], row['order_count'])
+        for row in rows
+    }
+
+
+def rebuild_revenue_rollup():
+    """
+    Replace the whole rollup table with buckets recomputed from the orders.
+    :return: The number of buckets written.
+    """
+    buckets = [
+        RevenueRollup(course_id=course_id, day=day, status=status, total=total, order_count=count)
+        for (course_id, day, status), (total, count) in order_rollup_rows().items()
+    ]
+    with transaction.atomic():
+        RevenueRollup.objects.all().delete()
+        RevenueRollup.objects.bulk_create(buckets, batch_size=1000)
+    return len(buckets)
+
+
+def revenue_rollup_drift():
+    """
+    Compare the rollup table against the orders it summarizes.
+    :return: A list of (bucket key, expected (total, count), actual (total, count)).
+    """
+    expected = order_rollup_rows()
+    actual = {
+        (row.course_id, row.day, row.status): (row.total, row.order_count)
+        for row in RevenueRollup.objects.filter(order_count__gt=0)
+    }
+    drift = []
+    for key in sorted(expected.keys() | actual.keys(), key=str):
+        want = expected.get(key, (0, 0))
+        have = actual.get(key, (0, 0))
+        if want != have:
+            drift.append((key, want, have))
+    return drift
+
+
+def total_revenue():
+    """
+    Sum of all order prices, read from the rollup buckets.
+    """
+    return RevenueRollup.objects.aggregate(total_price=Sum('total'))['total_price'] or 0
+
+
+def _is_day_aligned(value):
+    return value is None or timezone.localtime(value).time() == time.min
+
+
+def _group_by_course(rows):
+    course_data = {}
+    for row in rows:
+        course_data.setdefault(row['title'], []).append({
+            'bucket': row['bucket'],
+            'total': row['total'],
+            'count': row['count'],
+        })
+    return [{'name': title, 'data': data} for title, data in course_data.items()]
+
+
+def course_price_buckets(bucket='day', start=None, end=None):
+    """
+    Per-course order totals grouped into time buckets, in a single query.
+
+    Day, week and month buckets over whole days are read from the rollup
+    table; hourly buckets and partial-day ranges fall back to the orders.
+    :param bucket: One of 'hour', 'day', 'week' or 'month'.
+    :param start: Only include orders created at or after this datetime.
+    :param end: Only include orders created before this datetime.
+    :return: A list of {'name': course title, 'data': [{'bucket', 'total', 'count'}]}.
+    """
+    if bucket != 'hour' and _is_day_aligned(start) and _is_day_aligned(end):
+        return _group_by_course(_rollup_price_buckets(bucket, start, end))
+
+    orders = Order.objects.all()
+    if start is not None:
+        orders = orders.filter(created_at__gte=start)
+    if end is not None:
+        orders = orders.filter(created_at__lt=end)
+
+    rows = (
+        orders
+        .annotate(bucket=BUCKET_FUNCTIONS[bucket]('created_at'))
+        .values('bucket', title=F('course__title'))
+        .annotate(total=Sum('price'), count=Count('id'))
+        .order_by('title', 'bucket')
+    )
+    return _group_by_course(rows)
+
+
+def _rollup_price_buckets(bucket, start, end):
+    buckets = RevenueRollup.objects.all()
+    if start is not None:
+        buckets = buckets.filter(day__gte=rollup_day(start))
+    if end is not None:
+        buckets = buckets.filter(day__lt=rollup_day(end))
+
+    rows = (
+        buckets
+        .annotate(bucket_day=BUCKET_FUNCTIONS[bucket]('day'))
+        .values('bucket_day', title=F('course__title'))
+        .annotate(bucket_total=Sum('total'), count=Sum('order_count'))
+        .filter(count__gt=0)
+        .order_by('title', 'bucket_day')
+    )
+    for row in rows:
+        # Report buckets as datetimes, like the orders-table path does
+        bucket_start = datetime.combine(row['bucket_day'], time.min)
+        yield {
+            'title': row['title'],
+            'bucket': timezone.make_aware(bucket_start),
+            'total': row['bucket_total'],
+            'count': row['count'],
+        }
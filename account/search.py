@@ -0,0 +1,159 @@
+import html
+import re
+
+from django.db import connection, transaction
+
+from .models import Course, Lesson
+
+# FTS5 table created by migration 0009 (SQLite only). Rows are keyed by
+# rowid: 2 * id for courses, 2 * id + 1 for lessons, so a row is replaced
+# or deleted without a lookup.
+SEARCH_TABLE = 'account_search'
+COURSE, LESSON = 'course', 'lesson'
+KINDS = (COURSE, LESSON)
+
+# Fields copied into the index, per model
+COURSE_FIELDS = {'title', 'tagline', 'about'}
+LESSON_FIELDS = {'title', 'description', 'course'}
+
+# bm25() weights of the table's columns: kind, object_id, course_id,
+# title, tagline, body. A title match outranks one in the body.
+SEARCH_WEIGHTS = (0, 0, 0, 10.0, 4.0, 1.0)
+SNIPPET_TOKENS = 16
+MAX_QUERY_TERMS = 16
+
+# Snippet highlight markers, swapped for <mark> after escaping the text
+_OPEN, _CLOSE = '\x02', '\x03'
+
+
+def search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, object_id):
+    return 2 * object_id + (kind == LESSON)
+
+
+def _replace(rows):
+    """
+    Write (kind, object_id, course_id, title, tagline, body) rows to the index.
+    """
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(_rowid(row[0], row[1]),) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, course_id, title, tagline, body) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            [(_rowid(row[0], row[1]), *row) for row in rows])
+
+
+def index_courses(courses):
+    if search_enabled():
+        _replace([(COURSE, course.id, course.id, course.title, course.tagline, course.about) for course in courses])
+
+
+def index_lessons(lessons):
+    if search_enabled():
+        _replace([(LESSON, lesson.id, lesson.course_id, lesson.title, '', lesson.description) for lesson in lessons])
+
+
+def remove_from_index(kind, object_ids):
+    if search_enabled():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                [(_rowid(kind, object_id),) for object_id in object_ids])
+
+
+def rebuild_search_index():
+    """
+    Refill the index from the course and lesson tables, e.g. after writes
+    that bypass signals (QuerySet.update(), bulk_create(), raw SQL).
+    :return: The number of rows indexed.
+    """
+    if not search_enabled():
+        return 0
+    course_table, lesson_table = Course._meta.db_table, Lesson._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, course_id, title, tagline, body) '
+            f'SELECT 2 * id, %s, id, id, title, tagline, about FROM {course_table}', [COURSE])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, course_id, title, tagline, body) '
+            f"SELECT 2 * id + 1, %s, id, course_id, title, '', description FROM {lesson_table}", [LESSON])
+        # Merge the index b-trees written above into one
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """
+    Turn user input into an FTS5 query: every word must match, the last one
+    as a prefix so results show up while typing. Words are quoted, so FTS5
+    operators and syntax in the input are taken literally.
+    :return: The MATCH expression, or None if the input has no words.
+    """
+    terms = re.findall(r'\w+', query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def highlight(snippet):
+    return html.escape(snippet).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+class SearchResults:
+    """
+    The hits for a query, best first, fetched a page at a time: slicing
+    runs a LIMIT/OFFSET query and count() a COUNT(*), so Django's
+    paginator (and DRF's PageNumberPagination) can page through them.
+    """
+
+    def __init__(self, query, kind=None):
+        self.match = match_expression(query)
+        self.kind = kind
+
+    def _where(self):
+        where, params = f'{SEARCH_TABLE} MATCH %s', [self.match]
+        if self.kind is not None:
+            where += ' AND kind = %s'
+            params.append(self.kind)
+        return where, params
+
+    def count(self):
+        if self.match is None:
+            return 0
+        where, params = self._where()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {where}', params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('SearchResults only supports slicing without a step')
+        start, stop = key.start or 0, key.stop
+        if self.match is None or (stop is not None and stop <= start):
+            return []
+        where, params = self._where()
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT kind, object_id, course_id, title, '
+                f"snippet({SEARCH_TABLE}, -1, %s, %s, '…', %s), bm25({SEARCH_TABLE}, {weights}) AS score "
+                f'FROM {SEARCH_TABLE} WHERE {where} ORDER BY score LIMIT %s OFFSET %s',
+                [_OPEN, _CLOSE, SNIPPET_TOKENS, *params, -1 if stop is None else stop - start, start])
+            return [{
+                'type': kind,
+                'id': object_id,
+                'course': course_id,
+                'title': title,
+                'snippet': highlight(snippet),
+                # bm25() is lower for better matches
+                'score': round(-score, 4),
+            } for kind, object_id, course_id, title, snippet, score in cursor.fetchall()]
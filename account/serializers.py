@@ -1,9 +1,14 @@
+import re
 from rest_framework import serializers
 from account.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.urls import reverse
 from django.utils.encoding import smart_str, force_bytes, DjangoUnicodeDecodeError
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from account.utils import Util
+from account.revocation import revoke_user_tokens
+from account.thumbnail_store import get_thumbnail_store, validate_thumbnail
 from .models import Category, Course, Lesson, Comment, Report, Order
 
 
@@ -60,14 +65,21 @@ class UserChangePasswordSerializer(serializers.Serializer):
     def validate(self, attrs):
         password = attrs.get('password')
         password2 = attrs.get('password2')
-        user = self.context.get('user')
         if password != password2:
             raise serializers.ValidationError(
                 "Password and Confirm Password doesn't match")
-        user.set_password(password)
-        user.save()
         return attrs
 
+    def create(self, validated_data):
+        # Hashing happens on save() so the async view can validate first
+        # and hash off the event loop
+        user = self.context.get('user')
+        user.set_password(validated_data['password'])
+        user.save()
+        # Sessions signed in with the old password are logged out
+        revoke_user_tokens(user)
+        return user
+
 
 class SendPasswordResetEmailSerializer(serializers.Serializer):
     email = serializers.EmailField(max_length=255)
@@ -92,7 +104,7 @@ class SendPasswordResetEmailSerializer(serializers.Serializer):
                 'body': body,
                 'to_email': user.email
             }
-            # Util.send_email(data)
+            Util.queue_email(data)
             return attrs
         else:
             raise serializers.ValidationError('You are not a Registered User')
@@ -123,12 +135,149 @@ class UserPasswordResetSerializer(serializers.Serializer):
                     'Token is not Valid or Expired')
             user.set_password(password)
             user.save()
+            revoke_user_tokens(user)
             return attrs
         except DjangoUnicodeDecodeError as identifier:
             PasswordResetTokenGenerator().check_token(user, token)
             raise serializers.ValidationError('Token is not Valid or Expired')
 
 
+def _split_field_names(names):
+    """
+    Split dotted field names into top-level names and per-field nested names,
+    e.g. ['id', 'lessons.title'] -> ({'id', 'lessons'}, {'lessons': ['title']}).
+    """
+    top, nested = set(), {}
+    for name in names:
+        head, _, rest = name.strip().partition('.')
+        if not head:
+            continue
+        top.add(head)
+        if rest:
+            nested.setdefault(head, []).append(rest)
+    return top, nested
+
+
+class FieldSelection:
+    """
+    The fields a SparseFieldsetMixin serializer renders, along with the
+    selections of its nested sparse serializers. Query optimizers use it to
+    skip unneeded columns and prefetches.
+    """
+
+    def __init__(self, serializer_class, names, nested):
+        self.serializer_class = serializer_class
+        self.names = names
+        self.nested = nested
+        # Extra columns the view needs loaded, e.g. the pagination ordering
+        self.required = []
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def child(self, name):
+        return self.nested.get(name)
+
+    def model_fields(self):
+        """
+        The concrete model fields backing the selected serializer fields,
+        suitable for QuerySet.only().
+        """
+        model = self.serializer_class.Meta.model
+        declared = self.serializer_class._declared_fields
+        result = [model._meta.pk.name]
+        for name in list(self.names) + list(self.required):
+            field = declared.get(name)
+            source = (getattr(field, 'source', None) or name).split('.')[0]
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many and source not in result:
+                result.append(source)
+        return result
+
+
+class SparseFieldsetMixin:
+    """
+    Lets callers pick which fields a serializer renders, through a
+    FieldSelection passed as the `fields` keyword argument. Meta.list_fields
+    holds the compact set of fields rendered by list endpoints by default;
+    Meta.expand_fields are only rendered when asked for by name.
+    """
+
+    def __init__(self, *args, **kwargs):
+        selection = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if selection is not None:
+            self.apply_selection(selection)
+
+    def apply_selection(self, selection):
+        for name in list(self.fields):
+            if name not in selection:
+                self.fields.pop(name)
+            elif selection.child(name) is not None:
+                nested = self.fields[name]
+                getattr(nested, 'child', nested).apply_selection(selection.child(name))
+
+    @classmethod
+    def field_selection(cls, requested=None, expand=(), compact=False):
+        """
+        Work out which fields to render.
+        :param requested: Dotted field names from `?fields=`, or None for the defaults.
+        :param expand: Dotted field names from `?expand=` to add to the defaults.
+        :param compact: Default to Meta.list_fields instead of Meta.fields.
+        :return: A FieldSelection.
+        """
+        all_fields = list(cls.Meta.fields)
+        top_expand, nested_expand = _split_field_names(expand)
+        if requested is not None:
+            top_requested, nested_requested = _split_field_names(requested)
+            names = [name for name in all_fields if name in top_requested]
+        else:
+            nested_requested = {}
+            defaults = getattr(cls.Meta, 'list_fields', all_fields) if compact else all_fields
+            defaults = set(defaults) - set(getattr(cls.Meta, 'expand_fields', ()))
+            names = [name for name in all_fields if name in defaults or name in top_expand]
+
+        nested = {}
+        for name in names:
+            field = cls._declared_fields.get(name)
+            nested_class = type(getattr(field, 'child', field))
+            if issubclass(nested_class, SparseFieldsetMixin):
+                nested[name] = nested_class.field_selection(
+                    nested_requested.get(name), nested_expand.get(name, ()), compact=compact)
+        return FieldSelection(cls, names, nested)
+
+
+class ThumbnailField(serializers.CharField):
+    """
+    Course thumbnails live in the content-addressed thumbnail store; the
+    model only keeps their digest. Reads return the image URL, writes
+    accept a base64 image / data URL, or a URL previously returned here.
+    Uploads must be PNG, JPEG, GIF or WebP, up to THUMBNAIL_MAX_BYTES.
+    """
+    thumbnail_url_re = re.compile(r'/thumbnails/(?P<digest>[0-9a-f]{64})/?$')
+
+    def to_representation(self, value):
+        if not value:
+            return ''
+        url = reverse('thumbnail', args=[value])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        store = get_thumbnail_store()
+        match = self.thumbnail_url_re.search(data)
+        if match and store.exists(match.group('digest')):
+            return match.group('digest')
+        try:
+            return store.save(validate_thumbnail(data))
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -140,7 +289,8 @@ class CategorySerializer(serializers.ModelSerializer):
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
-        fields = ['user', 'content', 'createdAt']
+        fields = ['id', 'user', 'content', 'createdAt']
+        read_only_fields = ['user']
 
 
 class ReportSerializer(serializers.ModelSerializer):
@@ -149,25 +299,45 @@ class ReportSerializer(serializers.ModelSerializer):
         fields = ['user', 'reason', 'createdAt']
 
 
-class LessonSerializer(serializers.ModelSerializer):
-    comments = CommentSerializer(many=True, read_only=True)
+class LessonSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     reports = ReportSerializer(many=True, read_only=True)
 
     class Meta:
         model = Lesson
         fields = ['id', 'title', 'course', 'description', 'videoURL', 'duration',
-                  'order', 'likes', 'comments', 'reports', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+                  'order', 'order_key', 'likes', 'reports', 'like_count', 'comment_count',
+                  'report_count', 'created_at', 'updated_at']
+        list_fields = ['id', 'title', 'course', 'description', 'videoURL', 'duration',
+                       'order', 'order_key', 'like_count', 'comment_count', 'report_count',
+                       'created_at', 'updated_at']
+        # Unbounded; the counts above cover what most callers need
+        # Comments are paged through lessons/<id>/comments/ instead
+        expand_fields = ['likes', 'reports']
+        read_only_fields = ['like_count', 'comment_count', 'report_count',
+                            'created_at', 'updated_at']
         extra_kwargs = {
             'likes': {'required': False},
         }
 
-class CourseSerializer(serializers.ModelSerializer):
+class LessonImportSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk lesson import. The course comes from the request,
+    so validating a row runs no queries.
+    """
+    class Meta:
+        model = Lesson
+        fields = ['title', 'description', 'videoURL', 'duration', 'order']
+
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True)
+    thumbnail = ThumbnailField(source='thumbnail_hash')
+    category = serializers.SlugRelatedField(slug_field='title', queryset=Category.objects.all())
     class Meta:
         model = Course
         fields = ['id', 'title', 'about', 'tagline', 'tutor','category', 'difficulty',
                   'thumbnail', 'price', 'is_visible', 'lessons', 'created_at', 'updated_at']
+        list_fields = ['id', 'title', 'tagline', 'tutor', 'category', 'difficulty',
+                       'thumbnail', 'price', 'is_visible', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -1,11 +1,199 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Order
+from .models import Category, Comment, Course, Lesson, Order, Report, User
+from .authentication import invalidate_cached_user
+from .autocomplete import prefix_index
+from .counters import adjust_counter, recount
+from .enrollment import invalidate_enrollments
+from .generations import bump_generation
+from .ordering import key_after, last_key
+from .revenue import apply_to_rollup
+from .search import COURSE, COURSE_FIELDS, LESSON, LESSON_FIELDS, index_courses, index_lessons, remove_from_index
+
+
+@receiver(pre_save, sender=Order)
+def order_snapshot_listener(sender, instance, **kwargs):
+    # Remember which rollup bucket the order counted towards before this save
+    instance._rollup_previous = None
+    if instance.pk:
+        instance._rollup_previous = Order.objects.filter(pk=instance.pk).values(
+            'course_id', 'created_at', 'status', 'price').first()
 
 
 @receiver(post_save, sender=Order)
 def order_change_listener(sender, instance, created, **kwargs):
-    if created:
-        print(f"New order created: {instance}")
-    else:
-        print(f"Order updated: {instance}")
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        apply_to_rollup(previous['course_id'], previous['created_at'],
+                        previous['status'], previous['price'], sign=-1)
+    apply_to_rollup(instance.course_id, instance.created_at,
+                    instance.status, instance.price)
+
+
+@receiver(post_delete, sender=Order)
+def order_delete_listener(sender, instance, **kwargs):
+    apply_to_rollup(instance.course_id, instance.created_at,
+                    instance.status, instance.price, sign=-1)
+
+
+@receiver(m2m_changed, sender=User.enrolled_courses.through)
+def enrollment_change_listener(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.enrolled_courses.add(...) and friends
+        if action.startswith('post_'):
+            invalidate_enrollments([instance.pk])
+    elif action == 'pre_clear':
+        # course.user_set.clear(): the users are gone once post_clear fires
+        instance._enrolled_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_enrollments(getattr(instance, '_enrolled_user_ids', []))
+    elif action.startswith('post_'):
+        invalidate_enrollments(pk_set or [])
+
+
+@receiver(pre_delete, sender=Course)
+def course_delete_listener(sender, instance, **kwargs):
+    # Deleting a course drops its enrollment rows without an m2m_changed signal
+    invalidate_enrollments(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Report)
+@receiver(post_delete, sender=Report)
+def catalog_change_listener(sender, **kwargs):
+    # Moves ETags and response cache keys of the catalog endpoints along.
+    # After commit: a request that saw the new generation before then would
+    # read the old rows and tag or cache them under it.
+    transaction.on_commit(lambda: bump_generation(sender))
+
+
+@receiver(m2m_changed, sender=Lesson.likes.through)
+@receiver(m2m_changed, sender=Course.lessons.through)
+def lesson_relation_change_listener(sender, action, **kwargs):
+    if action.startswith('post_'):
+        transaction.on_commit(lambda: bump_generation(Lesson))
+
+
+def _indexed_fields_saved(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=Course)
+def course_search_listener(sender, instance, update_fields, **kwargs):
+    if _indexed_fields_saved(update_fields, COURSE_FIELDS):
+        index_courses([instance])
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_search_listener(sender, instance, update_fields, **kwargs):
+    if _indexed_fields_saved(update_fields, LESSON_FIELDS):
+        index_lessons([instance])
+
+
+@receiver(post_delete, sender=Course)
+def course_search_delete_listener(sender, instance, **kwargs):
+    remove_from_index(COURSE, [instance.pk])
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_search_delete_listener(sender, instance, **kwargs):
+    remove_from_index(LESSON, [instance.pk])
+
+
+@receiver(post_save, sender=Course)
+def course_autocomplete_listener(sender, instance, **kwargs):
+    # After commit, so a rolled back save never shows up in suggestions
+    transaction.on_commit(lambda: prefix_index.update(instance))
+
+
+@receiver(post_delete, sender=Course)
+def course_autocomplete_delete_listener(sender, instance, **kwargs):
+    course_id = instance.pk
+    transaction.on_commit(lambda: prefix_index.remove(course_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_autocomplete_listener(sender, **kwargs):
+    # Suggestions match category titles too; renames are rare, so rebuild
+    transaction.on_commit(prefix_index.clear)
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_order_key_listener(sender, instance, **kwargs):
+    # New lessons go to the end of their course
+    if instance._state.adding and not instance.order_key:
+        instance.order_key = key_after(last_key(instance.course_id))
+
+
+COUNTER_FIELDS = {Comment: 'comment_count', Report: 'report_count'}
+
+
+@receiver(pre_save, sender=Comment)
+@receiver(pre_save, sender=Report)
+def counted_snapshot_listener(sender, instance, **kwargs):
+    # Remember which lesson the row counted towards before this save
+    instance._counted_lesson_id = None
+    if not instance._state.adding:
+        instance._counted_lesson_id = sender.objects.filter(pk=instance.pk).values_list(
+            'lesson_id', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Report)
+def counted_change_listener(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_counted_lesson_id', None)
+    if created or previous is None:
+        adjust_counter([instance.lesson_id], COUNTER_FIELDS[sender], 1)
+    elif previous != instance.lesson_id:
+        adjust_counter([previous], COUNTER_FIELDS[sender], -1)
+        adjust_counter([instance.lesson_id], COUNTER_FIELDS[sender], 1)
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Report)
+def counted_delete_listener(sender, instance, **kwargs):
+    adjust_counter([instance.lesson_id], COUNTER_FIELDS[sender], -1)
+
+
+@receiver(m2m_changed, sender=Lesson.likes.through)
+def like_counter_listener(sender, instance, action, reverse, pk_set, **kwargs):
+    # pk_set holds the rows actually added, but every id asked to be removed
+    if action == 'post_add' and pk_set:
+        if reverse:
+            adjust_counter(pk_set, 'like_count', 1)
+        else:
+            adjust_counter([instance.pk], 'like_count', len(pk_set))
+    elif action == 'post_remove' and pk_set:
+        recount(pk_set if reverse else [instance.pk], ['like_count'])
+    elif action == 'pre_clear' and reverse:
+        instance._liked_lesson_ids = list(instance.liked_lessons.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        if reverse:
+            adjust_counter(getattr(instance, '_liked_lesson_ids', []), 'like_count', -1)
+        else:
+            Lesson.objects.filter(pk=instance.pk).update(like_count=0)
+
+
+@receiver(pre_delete, sender=User)
+def user_likes_delete_listener(sender, instance, **kwargs):
+    # The user's likes are deleted with it, without an m2m_changed signal
+    liked = list(instance.liked_lessons.values_list('pk', flat=True))
+    if liked:
+        adjust_counter(liked, 'like_count', -1)
+        transaction.on_commit(lambda: bump_generation(Lesson))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_change_listener(sender, instance, **kwargs):
+    # Blocking or deactivating must take effect on the user's next request
+    invalidate_cached_user(instance.pk)
@@ -0,0 +1,135 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASK_BATCH_SIZE = getattr(settings, 'TASK_BATCH_SIZE', 50)
+TASK_LEASE = getattr(settings, 'TASK_LEASE', 5 * 60)
+TASK_MAX_ATTEMPTS = getattr(settings, 'TASK_MAX_ATTEMPTS', 5)
+TASK_RETRY_BACKOFF = getattr(settings, 'TASK_RETRY_BACKOFF', 30)
+TASK_RETRY_MAX_BACKOFF = getattr(settings, 'TASK_RETRY_MAX_BACKOFF', 60 * 60)
+
+# name -> (handler, batch)
+registry = {}
+
+
+def register_task(name, batch=False):
+    """
+    Register a task handler under `name`. Plain handlers are called with one
+    payload at a time; batch handlers with the payloads of every claimed
+    task of that name, and return one error (or None) per payload, so they
+    can share setup such as an SMTP connection across the batch.
+    """
+    def decorator(handler):
+        registry[name] = (handler, batch)
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None):
+    """
+    Queue a task. Inside a transaction the task only becomes visible to
+    workers when (and if) the transaction commits.
+    :param name: A name passed to register_task().
+    :param payload: JSON-serializable arguments for the handler.
+    :param run_at: Don't run the task before this time.
+    :return: The Task.
+    """
+    if name not in registry:
+        raise ValueError(f'Unknown task {name!r}')
+    return Task.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or TASK_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff: TASK_RETRY_BACKOFF seconds after the first failed
+    attempt, doubling with each further one up to TASK_RETRY_MAX_BACKOFF.
+    """
+    return timedelta(seconds=min(TASK_RETRY_BACKOFF * 2 ** (attempts - 1), TASK_RETRY_MAX_BACKOFF))
+
+
+def claim_batch(limit=TASK_BATCH_SIZE):
+    """
+    Claim up to `limit` due tasks for this worker, leasing them for
+    TASK_LEASE seconds. Tasks left running by a worker that died are
+    claimed again once their lease expires.
+
+    Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent
+    workers claim disjoint batches without waiting on each other. Backends
+    without it (SQLite) claim each row with a conditional UPDATE instead.
+    """
+    now = timezone.now()
+    due = Q(status=Task.PENDING, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    claim = {'status': Task.RUNNING, 'locked_until': now + timedelta(seconds=TASK_LEASE),
+             'attempts': F('attempts') + 1}
+    with transaction.atomic():
+        candidates = Task.objects.filter(due).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(candidates.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Task.objects.filter(id__in=ids).update(**claim)
+        else:
+            ids = [
+                task_id for task_id in candidates.values_list('id', flat=True)[:limit]
+                if Task.objects.filter(due, id=task_id).update(**claim)
+            ]
+    return list(Task.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def finish(task, error):
+    if error is None:
+        task.delete()
+        return
+    logger.warning('Task %s failed (attempt %s/%s): %s', task, task.attempts, task.max_attempts, error)
+    task.last_error = f'{type(error).__name__}: {error}'
+    task.locked_until = None
+    if task.attempts >= task.max_attempts:
+        task.status = Task.FAILED
+    else:
+        task.status = Task.PENDING
+        task.run_at = timezone.now() + retry_delay(task.attempts)
+    task.save(update_fields=['status', 'run_at', 'locked_until', 'last_error', 'updated_at'])
+
+
+def run_batch(limit=TASK_BATCH_SIZE):
+    """
+    Claim and run one batch of due tasks.
+    :return: The number of tasks run, successful or not.
+    """
+    tasks = claim_batch(limit)
+    by_name = {}
+    for task in tasks:
+        by_name.setdefault(task.name, []).append(task)
+
+    for name, group in by_name.items():
+        if name not in registry:
+            errors = [LookupError(f'Unknown task {name!r}')] * len(group)
+        else:
+            handler, batch = registry[name]
+            if batch:
+                try:
+                    errors = list(handler([task.payload for task in group]))
+                except Exception as e:
+                    errors = [e] * len(group)
+            else:
+                errors = []
+                for task in group:
+                    try:
+                        handler(task.payload)
+                        errors.append(None)
+                    except Exception as e:
+                        errors.append(e)
+        for task, error in zip(group, errors):
+            finish(task, error)
+    return len(tasks)
@@ -1,3 +1,1257 @@
-from django.test import TestCase
+import io
+import json
+import math
+import random
+import shutil
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import tempfile
+from base64 import b64encode
+from importlib.util import find_spec
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from .authentication import local_users
+from .autocomplete import prefix_index
+from .revenue import course_price_buckets, parse_range_bound, rebuild_revenue_rollup, rollup_day
+from .renderers import UserRenderer, get_json_backend, orjson_dumps, stdlib_dumps
+from .checks import check_shared_cache, check_shared_cache_deploy
+from .counters import lesson_counter_drift
+from .generations import bump_generation, get_generations, shared_cache
+from .enrollment import enrolled_course_ids
+from .lesson_import import LESSON_IMPORT_MAX_ROWS, CourseLesson, create_lessons
+from .ordering import key_between, rebalance_course, spread_keys
+from .models import Category, Comment, Course, Lesson, Order, Report, RevenueRollup, Task, User, UserToken
+from .tasks import run_batch
+from .thumbnail_store import get_thumbnail_store
+from .user_tokens import prune_expired_tokens
+from .utils import Util
+from .views import admin_logout
+
+EXPAND_ALL = 'lessons.reports,lessons.likes'
+
+
+class CourseFixtureMixin:
+    """
+    A tutor, a student and a category, with helpers for courses and lessons.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.tutor = User.objects.create_user(
+            email='tutor@example.com', name='Tutor', password='secret', user_type='teacher')
+        self.student = User.objects.create_user(
+            email='student@example.com', name='Student', password='secret', user_type='student')
+        self.category = Category.objects.create(title='Programming', description='Description')
+
+    def make_course(self, title='Python Basics', **fields):
+        fields = {'tutor': self.tutor, 'about': 'About', 'tagline': 'Tagline', 'category': self.category,
+                  'price': 10, **fields}
+        return Course.objects.create(title=title, **fields)
+
+    def make_lesson(self, course, title='Lesson', **fields):
+        fields = {'description': 'Description', 'videoURL': 'https://example.com/video', 'duration': 10, **fields}
+        return Lesson.objects.create(title=title, course=course, **fields)
+
+
+class CatalogQueryBudgetTests(CourseFixtureMixin, TestCase):
+    """
+    The course and lesson endpoints must run a constant number of queries,
+    however many courses, lessons, comments, reports and likes there are.
+    """
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.client = APIClient()
+
+    def make_courses(self, count, lessons_per_course=3):
+        courses = []
+        # Generations move on commit, which the test transaction never does
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                course = self.make_course(f'Course {Course.objects.count()}', price='10.00')
+                for j in range(lessons_per_course):
+                    lesson = self.make_lesson(course, f'Lesson {j}', order=j)
+                    course.lessons.add(lesson)
+                    lesson.likes.add(self.student)
+                    Comment.objects.create(lesson=lesson, user=self.student, content='Nice')
+                    Report.objects.create(lesson=lesson, user=self.student, reason='Broken')
+                courses.append(course)
+        return courses
+
+    def assert_constant_queries(self, url, expected, authenticate=False):
+        if authenticate:
+            self.client.force_authenticate(self.student)
+        self.make_courses(1)
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+        self.make_courses(10)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_course_list_query_budget(self):
+        # validators, courses, lessons, reports, likes, facets
+        response = self.assert_constant_queries(f'/api/courses/?expand={EXPAND_ALL}', 6)
+        lesson = response.json()['results'][0]['lessons'][0]
+        self.assertEqual(lesson['likes'], [self.student.id])
+        self.assertEqual(lesson['comment_count'], 1)
+        self.assertEqual(len(lesson['reports']), 1)
+
+    def test_compact_course_list_skips_nested_queries(self):
+        # validators, courses, facets
+        response = self.assert_constant_queries('/api/courses/', 3)
+        course = response.json()['results'][0]
+        self.assertNotIn('lessons', course)
+        self.assertNotIn('about', course)
+
+    def test_sparse_course_fields_skip_unrequested_queries(self):
+        # validators, courses, lessons, facets
+        response = self.assert_constant_queries('/api/courses/?fields=id,lessons.title', 4)
+        course = response.json()['results'][0]
+        self.assertEqual(set(course), {'id', 'lessons'})
+        self.assertEqual(set(course['lessons'][0]), {'title'})
+
+    def test_admin_course_list_query_budget(self):
+        self.assert_constant_queries(f'/api/admin/courses/?expand={EXPAND_ALL}', 5)
+
+    def test_course_detail_query_budget(self):
+        course = self.make_courses(1, lessons_per_course=10)[0]
+        # validators, course, lessons: likes, comments and reports are counts
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/courses/{course.id}/')
+        lessons = response.json()['lessons']
+        self.assertEqual(len(lessons), 10)
+        self.assertEqual((lessons[0]['like_count'], lessons[0]['comment_count'], lessons[0]['report_count']),
+                         (1, 1, 1))
+        self.assertNotIn('comments', lessons[0])
+
+    def test_lesson_list_query_budget(self):
+        # validators, lessons, reports, likes
+        self.assert_constant_queries('/api/lessons/?expand=reports,likes', 4)
+
+    def test_tutor_course_list_query_budget(self):
+        self.client.force_authenticate(self.tutor)
+        self.assert_constant_queries(f'/api/tutor/courses/?expand={EXPAND_ALL}', 5)
+
+    def test_enrolled_courses_query_budget(self):
+        self.client.force_authenticate(self.student)
+        self.make_courses(1)
+        self.student.enrolled_courses.set(Course.objects.all())
+        url = f'/api/courses/enrolled_courses/?expand={EXPAND_ALL}'
+        # enrollment ids (cold cache), courses, lessons, reports, likes
+        with self.assertNumQueries(5):
+            self.client.get(url)
+        self.make_courses(10)
+        self.student.enrolled_courses.set(Course.objects.all())
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 11)
+
+
+class ConditionalGetTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.client = APIClient()
+        self.course = self.make_course('Course', price='10.00')
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get('/api/lessons/')['ETag']
+        # Only the validator query runs; nothing is serialized
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/lessons/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_embedded_change_invalidates_etag(self):
+        url = f'/api/courses/{self.course.id}/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = self.make_lesson(self.course)
+            self.course.lessons.add(lesson)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['lessons']), 1)
+
+    def test_etag_moves_on_commit(self):
+        etag = self.client.get('/api/lessons/')['ETag']
+        generations = get_generations([Lesson, Course])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                lesson = self.make_lesson(self.course)
+                self.course.lessons.add(lesson)
+                # Other connections still read the old rows
+                self.assertEqual(get_generations([Lesson, Course]), generations)
+            self.assertEqual(get_generations([Lesson, Course]), generations)
+        self.assertNotEqual(get_generations([Lesson, Course]), generations)
+        self.assertEqual(self.client.get('/api/lessons/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_rolled_back_write_keeps_etag(self):
+        etag = self.client.get('/api/lessons/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                self.make_lesson(self.course)
+                raise IntegrityError
+        self.assertEqual(self.client.get('/api/lessons/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_last_modified_without_dependencies(self):
+        category = Category.objects.create(title='Category', description='Description')
+        url = f'/api/categories/{category.id}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+
+class ResponseCacheTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.client = APIClient()
+        self.course = self.make_course('Course', price='10.00')
+
+    def test_repeated_reads_are_served_from_cache(self):
+        url = f'/api/courses/{self.course.id}/'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_invalidate_cached_responses(self):
+        url = f'/api/courses/{self.course.id}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = self.make_lesson(self.course)
+            self.course.lessons.add(lesson)
+            Comment.objects.create(lesson=lesson, user=self.tutor, content='Nice')
+        response = self.client.get(url)
+        self.assertEqual(response.json()['lessons'][0]['comment_count'], 1)
+
+    def test_explicit_bumps_wait_for_commit(self):
+        student = self.student
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = self.make_lesson(self.course)
+            lesson.likes.add(student)
+        row = {'title': 'Imported', 'description': 'Description', 'videoURL': 'https://example.com/video',
+               'duration': 10}
+        writes = {
+            'rebalance': lambda: rebalance_course(self.course.id),
+            'import': lambda: create_lessons(self.course, [row]),
+            'delete a user with likes': student.delete,
+        }
+        for name, write in writes.items():
+            generations = get_generations([Lesson])
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    write()
+                    # Cache keys built now must still belong to the committed rows
+                    self.assertEqual(get_generations([Lesson]), generations, name)
+            self.assertNotEqual(get_generations([Lesson]), generations, name)
+
+    def test_stats(self):
+        self.client.get('/api/categories/')
+        self.client.get('/api/categories/')
+        admin = User.objects.create_superuser(email='admin@example.com', name='Admin', password='secret')
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get('/api/cache/stats/').json(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+
+class CourseFacetTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.client = APIClient()
+        design = Category.objects.create(title='Design', description='Description')
+        for title, category, difficulty, price in [
+            ('Python', self.category, 'beginner', 10),
+            ('Rust', self.category, 'advanced', 80),
+            ('Figma', design, 'beginner', 30),
+        ]:
+            self.make_course(title, category=category, difficulty=difficulty, price=price)
+
+    def counts(self, facet):
+        return {item['value']: item['count'] for item in facet if item['count']}
+
+    def test_filters_and_disjunctive_facets(self):
+        body = self.client.get('/api/courses/?category=Programming&difficulty=beginner').json()
+        self.assertEqual([course['title'] for course in body['results']], ['Python'])
+        self.assertEqual(body['results'][0]['category'], 'Programming')
+        facets = body['facets']
+        # Each facet is counted with the other facets' filters only
+        self.assertEqual(self.counts(facets['category']), {'Programming': 1, 'Design': 1})
+        self.assertEqual(self.counts(facets['difficulty']), {'beginner': 1, 'advanced': 1})
+        self.assertEqual(self.counts(facets['price']), {'0-25': 1})
+        self.assertEqual(self.counts(facets['is_visible']), {True: 1})
+
+    def test_price_ranges(self):
+        body = self.client.get('/api/courses/?price=25-50,50-100').json()
+        self.assertEqual({course['title'] for course in body['results']}, {'Rust', 'Figma'})
+        self.assertEqual(self.client.get('/api/courses/?price=cheap').status_code, 400)
+
+    def test_category_is_written_by_title(self):
+        self.client.force_authenticate(self.tutor)
+        course = Course.objects.get(title='Python')
+        response = self.client.patch(f'/api/courses/{course.id}/', {'category': 'Design'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        course.refresh_from_db()
+        self.assertEqual(course.category.title, 'Design')
+        response = self.client.patch(f'/api/courses/{course.id}/', {'category': 'Cooking'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ROOT_URLCONF='djangoauthapi1.asgi_urls')
+class AsyncAuthTests(TestCase):
+    """
+    The ASGI auth endpoints hash on the executor but answer like the APIViews.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='student@example.com', name='Student', password='secret', user_type='student')
+
+    async def test_login_and_change_password(self):
+        response = await self.async_client.post(
+            '/api/auth/signin/', {'email': 'student@example.com', 'password': 'wrong'},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.post(
+            '/api/auth/signin/', {'email': 'student@example.com', 'password': 'secret'},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['userId'], self.user.id)
+
+        access = response.json()['token']['access']
+        response = await self.async_client.post(
+            '/api/auth/change-password/', {'password': 'changed', 'password2': 'changed'},
+            content_type='application/json', AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 200)
+        await sync_to_async(self.user.refresh_from_db)()
+        self.assertTrue(self.user.check_password('changed'))
+
+    async def test_register(self):
+        data = {'email': 'new@example.com', 'name': 'New', 'password': 'secret',
+                'password2': 'secret', 'user_type': 'student'}
+        response = await self.async_client.post('/api/auth/register/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.post('/api/auth/register/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json()['errors'])
+
+
+class AsyncCatalogTests(CourseFixtureMixin, TestCase):
+    """
+    The ASGI catalog views return what the sync views return, and answer
+    cached reads without touching the database (which would raise
+    SynchronousOnlyOperation on the event loop).
+    """
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.course = self.make_course('Course')
+
+    async def test_matches_sync_views(self):
+        for url in ('/api/courses/', f'/api/courses/{self.course.id}/', '/api/lessons/',
+                    f'/api/user/details/enrolled/{self.course.id}/check/'):
+            sync_response = await self.async_client.get(url)
+            with self.settings(ROOT_URLCONF='djangoauthapi1.asgi_urls'):
+                for _ in range(2):
+                    response = await self.async_client.get(url)
+                    self.assertEqual(response.status_code, sync_response.status_code)
+                    self.assertEqual(response.content, sync_response.content)
+                    self.assertEqual(dict(response.headers), dict(sync_response.headers))
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class TaskQueueTests(TestCase):
+    """
+    Password reset emails go through the task queue instead of the request.
+    """
+
+    def setUp(self):
+        User.objects.create_user(
+            email='student@example.com', name='Student', password='secret', user_type='student')
+
+    def test_password_reset_email_is_queued(self):
+        response = APIClient().post('/api/auth/send-password-reset-email/', {'email': 'student@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.get().name, 'send_email')
+
+        self.assertEqual(run_batch(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['student@example.com'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_tasks_are_retried_with_backoff(self):
+        task = Util.queue_email({'subject': 'Subject', 'body': 'Body', 'to_email': 'student@example.com'})
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=ConnectionError('SMTP down')):
+            run_batch()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertIn('SMTP down', task.last_error)
+        self.assertGreater(task.run_at, timezone.now())
+        # Not due yet
+        self.assertEqual(run_batch(), 0)
+
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now(), max_attempts=1)
+        run_batch()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(Task.objects.exists())
+
+
+class UserTokenTests(TestCase):
+    """
+    Issued tokens are recorded in their own table, not on the user row.
+    """
+
+    def test_login_records_tokens_and_prune_removes_expired(self):
+        user = User.objects.create_user(
+            email='student@example.com', name='Student', password='secret', user_type='student')
+        response = APIClient().post('/api/auth/signin/', {'email': 'student@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(user.tokens.values_list('token_type', flat=True)), [UserToken.ACCESS, UserToken.REFRESH])
+
+        access = user.tokens.get(token_type=UserToken.ACCESS)
+        self.assertEqual(prune_expired_tokens(), 0)
+        self.assertEqual(prune_expired_tokens(access.expires_at + timezone.timedelta(seconds=1)), 1)
+        self.assertEqual(user.tokens.get().token_type, UserToken.REFRESH)
+
+
+class RevocationTests(TestCase):
+    """
+    Revoked tokens are rejected; live ones are checked without a query.
+    """
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(
+            email='student@example.com', name='Student', password='secret', user_type='student')
+        self.client = APIClient()
+        tokens = self.client.post(
+            '/api/auth/signin/', {'email': 'student@example.com', 'password': 'secret'}).json()['token']
+        self.access, self.refresh = tokens['access'], tokens['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_live_tokens_cost_no_revocation_query(self):
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        # Users come from the auth cache and the filter rules the token out
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        response = self.client.post('/api/auth/logout/', {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+        self.assertEqual(UserToken.objects.filter(revoked_at__isnull=False).count(), 2)
+
+    def test_revocations_by_other_workers_are_seen(self):
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        # What another worker's logout leaves behind: the row and the shared
+        # counter, but not this worker's filter
+        UserToken.objects.filter(token_type='access').update(revoked_at=timezone.now())
+        bump_generation(UserToken)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_admin_logout_with_a_deleted_users_token(self):
+        request = RequestFactory().post('/admin/logout/')
+        request.COOKIES['adminToken'] = self.access
+        User.objects.filter(email='student@example.com').delete()
+        response = admin_logout(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserToken.objects.exists())
+        # Checks the deferred foreign keys a commit would
+        connection.check_constraints()
+
+    def test_password_change_revokes_tokens(self):
+        response = self.client.post('/api/auth/change-password/', {'password': 'changed', 'password2': 'changed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+
+class SearchTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.django = self.make_course(
+            'Django for Beginners', about='Build web apps with Python.', tagline='Models, views and templates')
+        self.python = self.make_course(
+            'Python Basics', about='Variables, loops and a first look at Django.', tagline='Start here')
+        self.lesson = self.make_lesson(self.django, 'Querysets', description='Filtering models with the <ORM>')
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranked_results_with_snippets(self):
+        body = self.search('django')
+        self.assertEqual(body['count'], 2)
+        # The title match ranks above the one in the description
+        self.assertEqual([hit['id'] for hit in body['results']], [self.django.id, self.python.id])
+        self.assertIn('<mark>Django</mark>', body['results'][1]['snippet'])
+
+    def test_prefix_type_filter_and_escaping(self):
+        hit, = self.search('model filt', type='lesson')['results']
+        self.assertEqual((hit['type'], hit['id'], hit['course']), ('lesson', self.lesson.id, self.django.id))
+        self.assertIn('&lt;ORM&gt;', hit['snippet'])
+        # FTS5 syntax in the input is taken literally
+        self.assertEqual([hit['id'] for hit in self.search('loops" AND (')['results']], [self.python.id])
+
+    def test_index_follows_writes(self):
+        self.python.title = 'Python Fundamentals'
+        self.python.save()
+        self.assertEqual(self.search('fundamentals')['results'][0]['id'], self.python.id)
+        self.django.delete()
+        self.assertEqual(self.search('querysets')['count'], 0)
+        self.assertEqual([hit['id'] for hit in self.search('django')['results']], [self.python.id])
+
+    def test_missing_query(self):
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+
+
+class AutocompleteTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        prefix_index.clear()
+        super().setUp()
+        self.client = APIClient()
+        self.courses = {}
+        for title, visible in [('Python Basics', True), ('Advanced Python', True),
+                               ('Pythagoras for Everyone', True), ('Python Secrets', False)]:
+            self.courses[title] = self.make_course(title, is_visible=visible)
+        self.student.enrolled_courses.add(self.courses['Advanced Python'])
+
+    def complete(self, query):
+        response = self.client.get('/api/courses/autocomplete/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [course['title'] for course in response.json()['results']]
+
+    def test_prefixes_ranked_by_enrollments(self):
+        self.assertEqual(self.complete('pyth'), ['Advanced Python', 'Python Basics', 'Pythagoras for Everyone'])
+        self.assertEqual(self.complete('python b'), ['Python Basics'])
+        self.assertEqual(self.complete('PROG every'), ['Pythagoras for Everyone'])
+        self.assertEqual(self.complete('rust'), [])
+        self.assertEqual(self.complete(''), [])
+
+    def test_follows_course_changes(self):
+        self.complete('pyth')
+        with self.captureOnCommitCallbacks(execute=True):
+            course = self.courses['Python Basics']
+            course.title = 'Rust Basics'
+            course.save()
+            self.courses['Python Secrets'].is_visible = True
+            self.courses['Python Secrets'].save()
+            self.courses['Pythagoras for Everyone'].delete()
+        self.assertEqual(self.complete('py'), ['Advanced Python', 'Python Secrets'])
+        self.assertEqual(self.complete('rus'), ['Rust Basics'])
+
+
+class LessonCounterTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.lesson = self.make_lesson(self.make_course(), 'Loops', order=1)
+
+    def counts(self):
+        self.lesson.refresh_from_db()
+        return self.lesson.like_count, self.lesson.comment_count, self.lesson.report_count
+
+    def test_like_toggle_is_idempotent(self):
+        url = f'/api/lessons/{self.lesson.id}/like/'
+        self.assertEqual(self.client.post(url).status_code, 401)
+        self.client.force_authenticate(self.student)
+        for _ in range(2):
+            self.assertEqual(self.client.post(url).json(), {'liked': True, 'like_count': 1})
+        for _ in range(2):
+            self.assertEqual(self.client.delete(url).json(), {'liked': False, 'like_count': 0})
+        self.assertEqual(self.client.post('/api/lessons/0/like/').status_code, 404)
+
+    def test_counts_follow_rows(self):
+        self.lesson.likes.add(self.student)
+        comment = Comment.objects.create(lesson=self.lesson, user=self.student, content='Nice')
+        Comment.objects.create(lesson=self.lesson, user=self.student, content='Great')
+        Report.objects.create(lesson=self.lesson, user=self.student, reason='Broken')
+        self.assertEqual(self.counts(), (1, 2, 1))
+        comment.delete()
+        self.student.liked_lessons.clear()
+        self.assertEqual(self.counts(), (0, 1, 1))
+        self.lesson.likes.add(self.student)
+        self.student.delete()
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_reconcile_repairs_drift(self):
+        Comment.objects.bulk_create([Comment(lesson=self.lesson, user=self.student, content='Nice') for _ in range(3)])
+        self.assertEqual(lesson_counter_drift(), [(self.lesson.id, 'comment_count', 3, 0)])
+        with self.assertRaises(CommandError):
+            call_command('reconcile_lesson_counters', '--check', stdout=io.StringIO())
+        call_command('reconcile_lesson_counters', stdout=io.StringIO())
+        self.assertEqual(self.counts(), (0, 3, 0))
+        self.assertEqual(lesson_counter_drift(), [])
+
+
+class LessonCommentTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.lesson = self.make_lesson(self.make_course(), 'Loops', order=1)
+        self.url = f'/api/lessons/{self.lesson.id}/comments/'
+
+    def test_post_requires_authentication(self):
+        self.assertEqual(self.client.post(self.url, {'content': 'Nice'}).status_code, 401)
+        self.client.force_authenticate(self.student)
+        response = self.client.post(self.url, {'content': 'Nice', 'user': 0})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['user'], self.student.id)
+        self.assertEqual(self.client.post(self.url, {}).status_code, 400)
+        self.assertEqual(self.client.post('/api/lessons/0/comments/', {'content': 'Nice'}).status_code, 404)
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.comment_count, 1)
+
+    def test_pages_newest_first(self):
+        Comment.objects.bulk_create([
+            Comment(lesson=self.lesson, user=self.student, content=f'Comment {i}') for i in range(5)])
+        contents, url = [], f'{self.url}?page_size=2'
+        while url:
+            # lesson, comments
+            with self.assertNumQueries(2):
+                page = self.client.get(url).json()
+            contents.extend(comment['content'] for comment in page['results'])
+            url = page['next']
+        self.assertEqual(contents, [f'Comment {i}' for i in reversed(range(5))])
+        self.assertNotIn('comments', self.client.get(f'/api/lessons/{self.lesson.id}/').json())
+
+
+class BulkLessonTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.course = self.make_course()
+        self.client.force_authenticate(self.tutor)
+
+    @staticmethod
+    def row(i):
+        return {'title': f'Lesson {i}', 'description': 'Description',
+                'videoURL': 'https://example.com/video', 'duration': 10, 'order': i}
+
+    def test_creates_lessons_in_constant_queries(self):
+        for count in (1, 50):
+            # course, savepoint, last order key, lessons, course links, search index (2), release
+            with self.assertNumQueries(8):
+                response = self.client.post('/api/lessons/bulk/', {
+                    'course': self.course.id, 'lessons': [self.row(i) for i in range(count)]}, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.json()), count)
+        self.assertEqual(self.course.lessons.count(), 51)
+        self.assertEqual(Lesson.objects.filter(course=self.course).count(), 51)
+
+    def test_invalid_rows_create_nothing(self):
+        rows = [self.row(1), {'title': 'No video'}, self.row(3)]
+        response = self.client.post('/api/lessons/bulk/', {'course': self.course.id, 'lessons': rows}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([error['row'] for error in errors], [2])
+        self.assertIn('videoURL', errors[0]['errors'])
+        self.assertFalse(Lesson.objects.exists())
+
+        other = User.objects.create_user(
+            email='other@example.com', name='Other', password='secret', user_type='teacher')
+        self.client.force_authenticate(other)
+        response = self.client.post('/api/lessons/bulk/', {
+            'course': self.course.id, 'lessons': [self.row(1)]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_largest_import_batches_inserts(self):
+        rows = [self.row(i) for i in range(LESSON_IMPORT_MAX_ROWS)]
+        lesson_fields = [field for field in Lesson._meta.concrete_fields if not field.primary_key]
+        link_fields = [field for field in CourseLesson._meta.concrete_fields if not field.primary_key]
+        batches = sum(math.ceil(len(rows) / connection.ops.bulk_batch_size(fields, rows))
+                      for fields in (lesson_fields, link_fields))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/lessons/bulk/', {'course': self.course.id, 'lessons': rows}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # course, savepoint, last order key, search index (2), release, and the INSERT batches
+        self.assertEqual(len(queries), 6 + batches)
+        self.assertEqual(self.course.lessons.count(), LESSON_IMPORT_MAX_ROWS)
+
+        response = self.client.post('/api/lessons/bulk/', {
+            'course': self.course.id, 'lessons': rows + [self.row(0)]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_bodies_are_rejected(self):
+        for body in ({'course': self.course.id, 'lessons': 5}, {'course': self.course.id, 'lessons': True},
+                     {'course': self.course.id, 'lessons': {'title': 'Intro'}}, {'course': [self.course.id]},
+                     {'course': self.course.id}, [self.row(1)]):
+            response = self.client.post('/api/lessons/bulk/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_imports_csv_and_json_files(self):
+        csv_file = io.BytesIO(
+            b'title,description,videoURL,duration,order\n'
+            b'Intro,Hello,https://example.com/1,5,1\n'
+            b'Loops,Repeat,https://example.com/2,7,\n')
+        csv_file.name = 'lessons.csv'
+        response = self.client.post('/api/lessons/bulk/', {'course': self.course.id, 'file': csv_file})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([lesson['order'] for lesson in response.json()], [1, None])
+        # bulk_create skips signals; the search index is updated by hand
+        search = self.client.get('/api/search/', {'q': 'repeat', 'type': 'lesson'}).json()
+        self.assertEqual([hit['title'] for hit in search['results']], ['Loops'])
+
+        json_file = io.BytesIO(json.dumps([self.row(3)]).encode())
+        json_file.name = 'lessons.json'
+        response = self.client.post('/api/lessons/bulk/', {'course': self.course.id, 'file': json_file})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.course.lessons.count(), 3)
+
+        bad_file = io.BytesIO(b'{"title": "not a list"}')
+        bad_file.name = 'lessons.json'
+        response = self.client.post('/api/lessons/bulk/', {'course': self.course.id, 'file': bad_file})
+        self.assertEqual(response.status_code, 400)
+
+
+class LessonOrderTests(CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.course = self.make_course()
+        self.lessons = [self.make_lesson(self.course, f'Lesson {i}') for i in range(4)]
+        self.client.force_authenticate(self.tutor)
+
+    def titles(self):
+        response = self.client.get('/api/lessons/', {'course': self.course.id, 'fields': 'title'})
+        return [lesson['title'] for lesson in response.json()['results']]
+
+    def move(self, lesson, **anchor):
+        return self.client.post(f'/api/lessons/{lesson.id}/move/',
+                                {place: other.id for place, other in anchor.items()}, format='json')
+
+    def test_key_between(self):
+        rng = random.Random(0)
+        keys = [key_between(None, None)]
+        for _ in range(500):
+            position = rng.randint(0, len(keys))
+            low = keys[position - 1] if position else None
+            high = keys[position] if position < len(keys) else None
+            key = key_between(low, high)
+            self.assertTrue((low is None or low < key) and (high is None or key < high))
+            keys.insert(position, key)
+        self.assertEqual(spread_keys(100), sorted(set(spread_keys(100))))
+        with self.assertRaises(ValueError):
+            key_between('b', 'a')
+
+    def test_move_writes_one_row(self):
+        self.assertEqual(self.titles(), ['Lesson 0', 'Lesson 1', 'Lesson 2', 'Lesson 3'])
+        keys = dict(Lesson.objects.values_list('id', 'order_key'))
+        self.assertEqual(self.move(self.lessons[3], before=self.lessons[0]).status_code, 200)
+        self.assertEqual(self.move(self.lessons[0], after=self.lessons[2]).status_code, 200)
+        self.assertEqual(self.titles(), ['Lesson 3', 'Lesson 1', 'Lesson 2', 'Lesson 0'])
+        changed = {pk for pk, key in Lesson.objects.values_list('id', 'order_key') if keys[pk] != key}
+        self.assertEqual(changed, {self.lessons[3].id, self.lessons[0].id})
+        self.move(self.lessons[3])
+        self.assertEqual(self.titles(), ['Lesson 1', 'Lesson 2', 'Lesson 0', 'Lesson 3'])
+
+    def test_move_checks_tutor_and_anchor(self):
+        other = User.objects.create_user(
+            email='other@example.com', name='Other', password='secret', user_type='teacher')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.move(self.lessons[0], after=self.lessons[1]).status_code, 403)
+        self.client.force_authenticate(self.tutor)
+        self.assertEqual(self.move(self.lessons[0], after=self.lessons[0]).status_code, 400)
+        self.assertEqual(self.move(self.lessons[0], after=self.lessons[1], before=self.lessons[2]).status_code, 400)
+        url = f'/api/lessons/{self.lessons[0].id}/move/'
+        for body in ([self.lessons[1].id], {'after': [self.lessons[1].id]}, {'before': {'id': 1}}, {'after': 'x'}):
+            self.assertEqual(self.client.post(url, body, format='json').status_code, 400, body)
+
+    def test_crowded_gap_rebalances(self):
+        # Every move splits the gap right after lesson 0, growing the keys
+        with mock.patch('account.ordering.ORDER_KEY_MAX_LENGTH', 4):
+            for i in range(60):
+                self.move(self.lessons[1 + i % 3], after=self.lessons[0])
+        self.assertTrue(all(len(key) <= 4 for key in Lesson.objects.values_list('order_key', flat=True)))
+        self.assertEqual(self.titles(), ['Lesson 0', 'Lesson 3', 'Lesson 2', 'Lesson 1'])
+        call_command('rebalance_lesson_order', '--longer-than', '0', stdout=io.StringIO())
+        self.assertEqual(self.titles(), ['Lesson 0', 'Lesson 3', 'Lesson 2', 'Lesson 1'])
+        self.assertTrue(all(len(key) == 1 for key in Lesson.objects.values_list('order_key', flat=True)))
+
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+
+
+class ThumbnailStoreMixin:
+    """
+    Points the thumbnail store at a throwaway directory.
+    """
+
+    def use_temporary_store(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(THUMBNAIL_STORE_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_thumbnail_store.cache_clear()
+        self.addCleanup(get_thumbnail_store.cache_clear)
+        return get_thumbnail_store()
+
+
+class ThumbnailTests(ThumbnailStoreMixin, CourseFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store = self.use_temporary_store()
+        self.client = APIClient()
+        self.course = self.make_course('Course', price='10.00')
+        self.client.force_authenticate(self.tutor)
+
+    def upload(self, thumbnail):
+        return self.client.patch(f'/api/courses/{self.course.id}/', {'thumbnail': thumbnail}, format='json')
+
+    def test_store_is_content_addressed(self):
+        digest = self.store.save(PNG)
+        self.assertEqual(self.store.save(PNG), digest)
+        self.assertEqual(self.store.read(digest), PNG)
+        self.assertFalse(self.store.exists('0' * 64))
+        self.assertFalse(self.store.exists('../etc/passwd'))
+        with self.assertRaises(FileNotFoundError):
+            self.store.read('not-a-digest')
+
+    def test_upload_round_trip(self):
+        response = self.upload(f'data:image/png;base64,{b64encode(PNG).decode()}')
+        self.assertEqual(response.status_code, 200)
+        url = response.json()['thumbnail']
+        self.course.refresh_from_db()
+        self.assertTrue(url.endswith(f'/api/thumbnails/{self.course.thumbnail_hash}/'))
+        # Sending the returned URL back keeps the same image
+        self.assertEqual(self.upload(url).json()['thumbnail'], url)
+
+        image = self.client.get(url)
+        self.assertEqual((image.status_code, image['Content-Type']), (200, 'image/png'))
+        self.assertEqual(b''.join(image), PNG)
+        self.assertNotIn('Content-Disposition', image)
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=image['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_rejects_other_types(self):
+        for data in (SVG, b'plain text', b'\x00\x01binary'):
+            response = self.upload(b64encode(data).decode())
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('thumbnail', response.json())
+        self.assertEqual(self.upload('not base64!').status_code, 400)
+
+    def test_rejects_oversized_uploads(self):
+        with mock.patch('account.thumbnail_store.THUMBNAIL_MAX_BYTES', 64):
+            self.assertEqual(self.upload(b64encode(PNG).decode()).status_code, 200)
+            self.assertEqual(self.upload(b64encode(PNG + b'\x00' * 64).decode()).status_code, 400)
+            # Rejected before decoding
+            self.assertEqual(self.upload('A' * 10000).status_code, 400)
+
+    def test_legacy_blobs_are_downloaded_not_rendered(self):
+        digest = self.store.save(SVG)
+        response = self.client.get(f'/api/thumbnails/{digest}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+
+    def test_not_modified_needs_an_existing_blob(self):
+        digest = 'a' * 64
+        response = self.client.get(f'/api/thumbnails/{digest}/', HTTP_IF_NONE_MATCH=f'"{digest}"')
+        self.assertEqual(response.status_code, 404)
+
+
+class ThumbnailMigrationTests(ThumbnailStoreMixin, TransactionTestCase):
+    """
+    Migration 0004 moves thumbnails out of the course table into the store, and back.
+    """
+    before, after = [('account', '0003_revenue_rollup')], [('account', '0004_thumbnail_store')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.store = self.use_temporary_store()
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes('account')
+        self.addCleanup(self.migrate, latest)
+
+    def test_thumbnails_move_to_the_store_and_back(self):
+        apps = self.migrate(self.before)
+        OldUser, OldCourse = apps.get_model('account', 'User'), apps.get_model('account', 'Course')
+        tutor = OldUser.objects.create(email='tutor@example.com', name='Tutor', password='!', user_type='teacher')
+        image = OldCourse.objects.create(
+            title='Image', tutor=tutor, about='About', tagline='Tagline', category='Programming', price=10,
+            thumbnail=f'data:image/png;base64,{b64encode(PNG).decode()}')
+        link = OldCourse.objects.create(
+            title='Link', tutor=tutor, about='About', tagline='Tagline', category='Programming', price=10,
+            thumbnail='https://example.com/image.png')
+
+        apps = self.migrate(self.after)
+        NewCourse = apps.get_model('account', 'Course')
+        self.assertEqual(self.store.read(NewCourse.objects.get(pk=image.pk).thumbnail_hash), PNG)
+        self.assertEqual(self.store.read(NewCourse.objects.get(pk=link.pk).thumbnail_hash),
+                         b'https://example.com/image.png')
+
+        apps = self.migrate(self.before)
+        OldCourse = apps.get_model('account', 'Course')
+        self.assertEqual(OldCourse.objects.get(pk=image.pk).thumbnail, image.thumbnail)
+        self.assertEqual(OldCourse.objects.get(pk=link.pk).thumbnail, link.thumbnail)
+
+
+class SharedCacheTests(TestCase):
+
+    def test_generations_live_in_the_shared_alias(self):
+        before = get_generations([Course])[0]
+        bump_generation(Course)
+        self.assertEqual(shared_cache().get('generation:account.course'), before + 1)
+        self.assertIsNone(cache.get('generation:account.course'))
+
+    def test_local_memory_alias_is_flagged(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['account.W001'])
+        self.assertEqual([error.id for error in check_shared_cache_deploy(None)], ['account.E001'])
+        shared = {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': '127.0.0.1:11211'}
+        with override_settings(CACHES={'default': settings.CACHES['default'], 'shared': shared}):
+            self.assertEqual(check_shared_cache(None) + check_shared_cache_deploy(None), [])
+
+
+class CachedAuthenticationTests(TestCase):
+    """
+    JWT users come from the auth cache, but a saved change rejects them at once.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='student@example.com', name='Student', password='secret', user_type='student')
+        self.client = APIClient()
+        access = self.client.post(
+            '/api/auth/signin/', {'email': 'student@example.com', 'password': 'secret'}).json()['token']['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+
+    def test_cache_hit_runs_no_query(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.json()['email'], 'student@example.com')
+
+    def test_blocked_user_rejected_on_next_request(self):
+        self.user.is_blocked = True
+        self.user.save()
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['errors']['code'], 'user_blocked')
+
+    def test_inactive_user_rejected_on_next_request(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_stale_copies_in_other_workers_are_ignored(self):
+        # Another worker still holds the user in its own LRU and default cache;
+        # only the version counter in the shared alias tells it about the save
+        stale = local_users._entries[self.user.id]
+        stale_entry = cache.get(f'auth:user:{self.user.id}')
+        self.user.is_blocked = True
+        self.user.save()
+        local_users._entries[self.user.id] = stale
+        cache.set(f'auth:user:{self.user.id}', stale_entry)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_deleted_user_rejected(self):
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+
+class EnrollmentBatchTests(CourseFixtureMixin, TestCase):
+    url = '/api/user/details/enrolled/check/'
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.client = APIClient()
+        self.courses = [self.make_course(f'Course {i}') for i in range(3)]
+        self.student.enrolled_courses.add(self.courses[0], self.courses[2])
+        self.client.force_authenticate(self.student)
+
+    def test_mixed_enrollment(self):
+        ids = [course.id for course in self.courses]
+        expected = {str(ids[0]): True, str(ids[1]): False, str(ids[2]): True}
+        response = self.client.get(self.url, {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.json()['enrolled'], expected)
+        response = self.client.post(self.url, {'course_ids': ids}, format='json')
+        self.assertEqual(response.json()['enrolled'], expected)
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url, {'ids': str(ids[0])})
+        self.assertEqual(response.json()['enrolled'], {str(ids[0]): False})
+
+    def test_malformed_ids(self):
+        for body in ({'course_ids': ['one']}, {'course_ids': [[1]]}, {'course_ids': 5}, {'course_ids': '1,2'}, [1]):
+            self.assertEqual(self.client.post(self.url, body, format='json').status_code, 400, body)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, 400)
+
+    def test_cap_is_checked_before_parsing(self):
+        with mock.patch('account.views.ENROLLMENT_BATCH_MAX_IDS', 3):
+            self.assertEqual(self.client.get(self.url, {'ids': '1,2,3'}).status_code, 200)
+            # Over the cap: rejected for its size, not for the malformed id in it
+            response = self.client.get(self.url, {'ids': '1,2,3,x'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('At most 3', response.json()['error'])
+
+
+class EnrollmentCacheTests(CourseFixtureMixin, TestCase):
+    """
+    Cached enrolled ids are dropped whichever side of the relation changes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.other = User.objects.create_user(
+            email='other@example.com', name='Other', password='secret', user_type='student')
+        self.first, self.second = [self.make_course(f'Course {i}') for i in range(2)]
+        self.student.enrolled_courses.add(self.first)
+        self.other.enrolled_courses.add(self.first)
+
+    def assert_enrolled(self, user, courses):
+        self.assertEqual(enrolled_course_ids(user), {course.id for course in courses})
+        # Cached until the next change
+        with self.assertNumQueries(0):
+            enrolled_course_ids(user)
+
+    def test_user_side_changes(self):
+        self.assert_enrolled(self.student, [self.first])
+        self.student.enrolled_courses.add(self.second)
+        self.assert_enrolled(self.student, [self.first, self.second])
+        self.student.enrolled_courses.remove(self.first)
+        self.assert_enrolled(self.student, [self.second])
+        self.student.enrolled_courses.clear()
+        self.assert_enrolled(self.student, [])
+
+    def test_course_side_changes(self):
+        self.assert_enrolled(self.student, [self.first])
+        self.assert_enrolled(self.other, [self.first])
+        self.second.user_set.add(self.student)
+        self.assert_enrolled(self.student, [self.first, self.second])
+        self.first.user_set.remove(self.student)
+        self.assert_enrolled(self.student, [self.second])
+        self.assert_enrolled(self.other, [self.first])
+        self.second.user_set.clear()
+        self.assert_enrolled(self.student, [])
+        self.first.user_set.clear()
+        self.assert_enrolled(self.other, [])
+
+    def test_course_delete(self):
+        self.assert_enrolled(self.student, [self.first])
+        self.assert_enrolled(self.other, [self.first])
+        self.first.delete()
+        self.assert_enrolled(self.student, [])
+        self.assert_enrolled(self.other, [])
+
+
+class UserRendererTests(TestCase):
+    payload = {
+        'price': Decimal('10.50'),
+        'created_at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        'naive': datetime(2024, 5, 1, 12, 30),
+        'day': date(2024, 5, 1),
+        'duration': timedelta(minutes=90),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'enrolled': {1: True, 2: False},
+        'title': 'Café ☕',
+        'lessons': [{'id': 1, 'order': None}],
+    }
+
+    def setUp(self):
+        get_json_backend.cache_clear()
+        self.addCleanup(get_json_backend.cache_clear)
+
+    def test_stdlib_encoding(self):
+        encoded = json.loads(stdlib_dumps(self.payload))
+        self.assertEqual(encoded['created_at'], '2024-05-01T12:30:15.123456Z')
+        self.assertEqual(encoded['id'], '12345678-1234-5678-1234-567812345678')
+        self.assertEqual(encoded['enrolled'], {'1': True, '2': False})
+        self.assertEqual(encoded['price'], 10.5)
+
+    @skipUnless(find_spec('orjson'), 'orjson is not installed')
+    def test_backends_encode_the_same_json(self):
+        self.assertIs(get_json_backend('orjson'), orjson_dumps)
+        self.assertEqual(json.loads(orjson_dumps(self.payload)), json.loads(stdlib_dumps(self.payload)))
+
+    def test_missing_backend_falls_back_to_stdlib(self):
+        self.assertIs(get_json_backend('no.such.module.dumps'), stdlib_dumps)
+        # None in sys.modules makes the import fail as if orjson were not installed
+        with mock.patch.dict(sys.modules, {'orjson': None}):
+            self.assertIs(get_json_backend('orjson'), stdlib_dumps)
+
+    def test_errors_are_wrapped(self):
+        renderer = UserRenderer()
+        errors = {'email': [ErrorDetail('This field is required.', code='required')]}
+        for backend in ('json', 'orjson'):
+            with override_settings(USER_RENDERER_JSON_BACKEND=backend):
+                rendered = json.loads(renderer.render(errors, renderer_context={'response': Response(status=400)}))
+                self.assertEqual(rendered, {'errors': {'email': ['This field is required.']}})
+                # Outside a response the payload itself decides
+                self.assertIn('errors', json.loads(renderer.render(errors)))
+                rendered = json.loads(renderer.render({'msg': 'ok'}, renderer_context={'response': Response(status=200)}))
+                self.assertEqual(rendered, {'msg': 'ok'})
+
+
+class RevenueRollupTests(CourseFixtureMixin, TestCase):
+    """
+    Order saves and deletes keep the rollup buckets equal to the orders table.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.python, self.django = self.make_course('Python'), self.make_course('Django')
+
+    def assert_buckets(self, order, expected):
+        day = rollup_day(order.created_at)
+        buckets = {
+            (row.course_id, row.status): (row.total, row.order_count)
+            for row in RevenueRollup.objects.filter(day=day, order_count__gt=0)
+        }
+        self.assertEqual(buckets, expected)
+        # Raises CommandError on any drift from the orders table
+        call_command('rebuild_revenue_rollup', '--check', stdout=io.StringIO())
+
+    def test_buckets_follow_order_changes(self):
+        order = Order.objects.create(user=self.student, course=self.python, status=Order.PENDING, price=10)
+        self.assert_buckets(order, {(self.python.id, Order.PENDING): (Decimal('10'), 1)})
+
+        Order.objects.create(user=self.student, course=self.python, status=Order.PENDING, price=5)
+        self.assert_buckets(order, {(self.python.id, Order.PENDING): (Decimal('15'), 2)})
+
+        order.status = Order.COMPLETED
+        order.save()
+        self.assert_buckets(order, {
+            (self.python.id, Order.PENDING): (Decimal('5'), 1),
+            (self.python.id, Order.COMPLETED): (Decimal('10'), 1),
+        })
+
+        order.price = Decimal('12.50')
+        order.course = self.django
+        order.save()
+        self.assert_buckets(order, {
+            (self.python.id, Order.PENDING): (Decimal('5'), 1),
+            (self.django.id, Order.COMPLETED): (Decimal('12.50'), 1),
+        })
+
+        order.delete()
+        self.assert_buckets(order, {(self.python.id, Order.PENDING): (Decimal('5'), 1)})
+
+    def test_check_reports_drift(self):
+        order = Order.objects.create(user=self.student, course=self.python, status=Order.COMPLETED, price=10)
+        # A queryset update skips the signals
+        Order.objects.filter(pk=order.pk).update(price=20)
+        stdout = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 revenue rollup bucket(s) drifted'):
+            call_command('rebuild_revenue_rollup', '--check', stdout=stdout)
+        self.assertIn(f'course={self.python.id}', stdout.getvalue())
+        self.assertIn('found total=10.00 count=1', stdout.getvalue())
+
+        call_command('rebuild_revenue_rollup', stdout=io.StringIO())
+        stdout = io.StringIO()
+        call_command('rebuild_revenue_rollup', '--check', stdout=stdout)
+        self.assertIn('matches the orders table', stdout.getvalue())
+        self.assertEqual(RevenueRollup.objects.get().total, Decimal('20'))
+
+
+class CoursePriceBucketTests(CourseFixtureMixin, TestCase):
+    url = '/api/orders/course_prices/'
+
+    def setUp(self):
+        super().setUp()
+        self.course = self.make_course('Python')
+        # Monday and Wednesday of the same week, the last hour of January, then February
+        for created_at, price in ((datetime(2024, 1, 1, 9), 10), (datetime(2024, 1, 3, 9), 20),
+                                  (datetime(2024, 1, 31, 23), 30), (datetime(2024, 2, 5, 9), 40)):
+            order = Order.objects.create(user=self.student, course=self.course, status=Order.COMPLETED, price=price)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(created_at))
+        rebuild_revenue_rollup()
+
+    def buckets(self, bucket, start=None, end=None):
+        [course] = course_price_buckets(bucket, start, end)
+        self.assertEqual(course['name'], 'Python')
+        return [(row['bucket'].date().isoformat(), row['total'], row['count']) for row in course['data']]
+
+    def test_buckets(self):
+        self.assertEqual(self.buckets('day'), [
+            ('2024-01-01', 10, 1), ('2024-01-03', 20, 1), ('2024-01-31', 30, 1), ('2024-02-05', 40, 1)])
+        self.assertEqual(self.buckets('week'), [
+            ('2024-01-01', 30, 2), ('2024-01-29', 30, 1), ('2024-02-05', 40, 1)])
+        self.assertEqual(self.buckets('month'), [('2024-01-01', 60, 3), ('2024-02-01', 40, 1)])
+
+    def test_rollup_and_orders_agree(self):
+        start, end = parse_range_bound('2024-01-02'), parse_range_bound('2024-01-31', end=True)
+        self.assertEqual(self.buckets('day', start, end), [('2024-01-03', 20, 1), ('2024-01-31', 30, 1)])
+        # Starting mid-day reads the orders table instead of the rollup
+        self.assertEqual(self.buckets('day', start + timedelta(hours=1), end),
+                         [('2024-01-03', 20, 1), ('2024-01-31', 30, 1)])
+        self.assertEqual(self.buckets('hour', start, end)[-1], ('2024-01-31', 30, 1))
+
+    def test_parse_range_bound(self):
+        self.assertIsNone(parse_range_bound(''))
+        self.assertIsNone(parse_range_bound(None))
+        january_31 = timezone.make_aware(datetime(2024, 1, 31))
+        self.assertEqual(parse_range_bound('2024-01-31'), january_31)
+        # A bare end date includes the whole day
+        self.assertEqual(parse_range_bound('2024-01-31', end=True), january_31 + timedelta(days=1))
+        self.assertEqual(parse_range_bound('2024-01-31T10:30:00', end=True), january_31 + timedelta(hours=10, minutes=30))
+        self.assertEqual(parse_range_bound('2024-01-31T10:30:00+02:00'), january_31 + timedelta(hours=8, minutes=30))
+        for value in ('yesterday', '2024-13-01', '2024-01-31T25:00:00'):
+            with self.assertRaises(ValueError):
+                parse_range_bound(value)
+
+    def test_endpoint(self):
+        response = self.client.get(self.url, {'bucket': 'month', 'from': '2024-01-03', 'to': '2024-01-31'})
+        self.assertEqual(response.status_code, 200)
+        [course] = response.json()['courseList']
+        self.assertEqual([(row['bucket'][:10], row['count']) for row in course['data']], [('2024-01-01', 2)])
+        for params in ({'bucket': 'year'}, {'from': 'yesterday'}, {'to': '2024-02-30'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+
+class HotQueryCommandTests(TransactionTestCase):
+
+    def test_benchmark_runs(self):
+        stdout = io.StringIO()
+        call_command('explain_hot_queries', '--benchmark', '--users', '40', '--courses', '5',
+                     '--lessons', '30', '--orders', '50', '--repeat', '1', stdout=stdout)
+        self.assertEqual(stdout.getvalue().count('faster'), 5)
@@ -0,0 +1,122 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Largest thumbnail accepted on upload, in bytes after base64 decoding
+THUMBNAIL_MAX_BYTES = getattr(settings, 'THUMBNAIL_MAX_BYTES', 2 * 1024 * 1024)
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+DATA_URL_RE = re.compile(r'^data:(?P<type>[^;,]*)(?:;[^;,]*)*;base64,(?P<data>.*)$', re.S)
+
+# Magic numbers of the image formats we expect to see
+CONTENT_TYPES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+# The only types accepted on upload and served inline. SVG is left out:
+# it can carry script, which would run on the API's origin.
+IMAGE_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/webp')
+
+
+class FileSystemThumbnailStore:
+    """
+    Content-addressed blob store on the local filesystem. Each blob lives
+    at <root>/<first two hex digits>/<sha256 hex digest>, so identical
+    images are stored once and a digest never changes meaning.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, digest):
+        return self.root / digest[:2] / digest
+
+    def save(self, data):
+        """
+        Store a blob.
+        :param data: The blob bytes.
+        :return: The sha256 hex digest addressing the blob.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so readers never see partial blobs
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def exists(self, digest):
+        return bool(DIGEST_RE.match(digest)) and self.path(digest).exists()
+
+    def read(self, digest):
+        """
+        :raises FileNotFoundError: If no blob has this digest.
+        """
+        if not DIGEST_RE.match(digest):
+            raise FileNotFoundError(digest)
+        return self.path(digest).read_bytes()
+
+
+@lru_cache(maxsize=None)
+def get_thumbnail_store():
+    backend = getattr(settings, 'THUMBNAIL_STORE_BACKEND', 'account.thumbnail_store.FileSystemThumbnailStore')
+    root = getattr(settings, 'THUMBNAIL_STORE_ROOT', Path(settings.BASE_DIR) / 'media' / 'thumbnails')
+    return import_string(backend)(root)
+
+
+def decode_thumbnail(value):
+    """
+    Decode a thumbnail submitted as a `data:` URL or as bare base64.
+    :param value: The submitted string.
+    :return: The image bytes.
+    :raises ValueError: If the value is not valid base64.
+    """
+    match = DATA_URL_RE.match(value)
+    payload = match.group('data') if match else value
+    try:
+        return base64.b64decode(''.join(payload.split()), validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('Thumbnail must be a base64 encoded image or data URL')
+
+
+def validate_thumbnail(value):
+    """
+    Decode an uploaded thumbnail and check it is a small enough raster image.
+    :param value: The submitted base64 string or data URL.
+    :return: The image bytes.
+    :raises ValueError: If the value is not base64, too large, or not a PNG,
+        JPEG, GIF or WebP image.
+    """
+    # Reject oversized input before decoding it; base64 takes 4 chars per 3 bytes
+    if len(value) > (THUMBNAIL_MAX_BYTES + 2) // 3 * 4 + 1024:
+        raise ValueError(f'Thumbnail must be at most {THUMBNAIL_MAX_BYTES} bytes')
+    data = decode_thumbnail(value)
+    if len(data) > THUMBNAIL_MAX_BYTES:
+        raise ValueError(f'Thumbnail must be at most {THUMBNAIL_MAX_BYTES} bytes')
+    if sniff_content_type(data) not in IMAGE_TYPES:
+        raise ValueError('Thumbnail must be a PNG, JPEG, GIF or WebP image')
+    return data
+
+
+def sniff_content_type(data):
+    for magic, content_type in CONTENT_TYPES:
+        if data.startswith(magic):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data.lstrip()[:5] in (b'<?xml', b'<svg ') or data.lstrip()[:4] == b'<svg':
+        return 'image/svg+xml'
+    return 'application/octet-stream'
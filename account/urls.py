@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     UserRegistrationView,
     UserLoginView,
+    UserLogoutView,
     UserProfileView,
     UserChangePasswordView,
     SendPasswordResetEmailView,
@@ -13,10 +14,15 @@ from .views import (
     OrderViewSet,
     TutorViewSet,
     check_enrollment,
+    CheckEnrollmentBatchView,
+    thumbnail_image,
     UserOrderViewSet,
     TutorCourseViewSet,
     UserViewSet,
-    AdminAllCourseViewSet
+    AdminAllCourseViewSet,
+    ResponseCacheStatsView,
+    HasherStatsView,
+    SearchView,
 )
 
 # Create a router and register our viewsets with it.
@@ -52,6 +58,7 @@ urlpatterns = [
     path('auth/register/', UserRegistrationView.as_view(),
          name='user-registration'),
     path('auth/signin/', UserLoginView.as_view(), name='user-login'),
+    path('auth/logout/', UserLogoutView.as_view(), name='user-logout'),
     path('auth/profile/', UserProfileView.as_view(), name='user-profile'),
     path('auth/change-password/', UserChangePasswordView.as_view(),
          name='user-change-password'),
@@ -62,4 +69,10 @@ urlpatterns = [
     path('user/details/', UserProfileView.as_view(), name='user-profile'),
 
     path('user/details/enrolled/<int:course_id>/check/', check_enrollment, name='check_enrollment'),
+    path('user/details/enrolled/check/', CheckEnrollmentBatchView.as_view(), name='check_enrollment_batch'),
+
+    path('search/', SearchView.as_view(), name='search'),
+    path('thumbnails/<str:digest>/', thumbnail_image, name='thumbnail'),
+    path('cache/stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
+    path('auth/hasher/stats/', HasherStatsView.as_view(), name='hasher-stats'),
 ]
\ No newline at end of file
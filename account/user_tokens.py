@@ -0,0 +1,51 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import UserToken
+
+
+def token_claim_time(token, claim):
+    """
+    A timestamp claim of a simplejwt token as a datetime (now if absent).
+    """
+    if claim not in token:
+        return timezone.now()
+    return datetime.fromtimestamp(token[claim], tz=dt_timezone.utc)
+
+
+def record_tokens(user, *tokens):
+    """
+    Store issued simplejwt tokens in the UserToken table.
+    """
+    UserToken.objects.bulk_create([
+        UserToken(
+            user=user,
+            jti=token[api_settings.JTI_CLAIM],
+            token_type=token[api_settings.TOKEN_TYPE_CLAIM],
+            issued_at=token_claim_time(token, 'iat'),
+            expires_at=token_claim_time(token, 'exp'),
+        )
+        for token in tokens
+    ])
+
+
+def issue_tokens(user):
+    """
+    A new refresh/access token pair for `user`, recorded in UserToken.
+    """
+    refresh = RefreshToken.for_user(user)
+    access = refresh.access_token
+    record_tokens(user, refresh, access)
+    return refresh, access
+
+
+def prune_expired_tokens(before=None):
+    """
+    Delete tokens that expired before `before` (default: now).
+    :return: The number of tokens deleted.
+    """
+    deleted, _ = UserToken.objects.filter(expires_at__lt=before or timezone.now()).delete()
+    return deleted
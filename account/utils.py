@@ -1,13 +1,45 @@
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMessage, get_connection
 import os
 
+from .tasks import enqueue, register_task
+
 class Util:
   @staticmethod
-  def send_email(data):
-    email = EmailMessage(
+  def build_email(data, connection=None):
+    return EmailMessage(
       subject=data['subject'],
       body=data['body'],
       from_email=os.environ.get('EMAIL_FROM'),
-      to=[data['to_email']]
+      to=[data['to_email']],
+      connection=connection,
     )
-    email.send()
\ No newline at end of file
+
+  @staticmethod
+  def send_email(data):
+    Util.build_email(data).send()
+
+  @staticmethod
+  def queue_email(data):
+    """
+    Send the email from the task queue (`manage.py run_tasks`) instead of
+    blocking the request on the SMTP round trip.
+    """
+    return enqueue('send_email', data)
+
+
+@register_task('send_email', batch=True)
+def send_email_batch(payloads):
+  # One SMTP connection (and TLS handshake) for the whole batch
+  connection = get_connection()
+  errors = []
+  try:
+    connection.open()
+    for data in payloads:
+      try:
+        Util.build_email(data, connection=connection).send()
+        errors.append(None)
+      except Exception as e:
+        errors.append(e)
+  finally:
+    connection.close()
+  return errors
@@ -4,15 +4,22 @@ from rest_framework.views import APIView
 from account.serializers import SendPasswordResetEmailSerializer, UserChangePasswordSerializer, UserLoginSerializer, UserPasswordResetSerializer, UserProfileSerializer, UserRegistrationSerializer
 from django.contrib.auth import authenticate
 from account.renderers import UserRenderer
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Sum
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from django.utils import timezone
 from rest_framework.exceptions import PermissionDenied
 
 from rest_framework import viewsets
-from .models import Category, Course, Lesson, Order, User
-from .serializers import CategorySerializer, CourseSerializer, LessonSerializer, OrderSerializer, TutorSerializer
+from .models import DIFFICULTY, Category, Comment, Course, Lesson, Order, Report, User
+from .serializers import CategorySerializer, CommentSerializer, CourseSerializer, LessonSerializer, OrderSerializer, TutorSerializer
+from .querysets import OptimizedQuerysetMixin, optimized_courses, optimized_lessons
+from .conditional import ConditionalGetMixin
+from .filters import BooleanFacet, CourseLessonsFilterBackend, Facet, FacetedListMixin, FacetFilterBackend, RangeFacet
+from .response_cache import CachedResponseMixin, reset_response_cache_stats, response_cache_stats
+from .enrollment import ENROLLMENT_BATCH_MAX_IDS, enrolled_course_ids, enrollment_map, is_enrolled
+from .revenue import BUCKET_FUNCTIONS, course_price_buckets, parse_range_bound, total_revenue
 
 
 # New =====================>>>>
@@ -23,16 +30,30 @@ from .generate_tokens_util import create_access_token_admin
 from .attach_token_to_cookie_util import attach_token_to_cookie
 import os
 from django.views.decorators.http import require_http_methods
+from django.http import HttpResponse, HttpResponseNotModified, Http404
+from django.utils.http import parse_etags
+from .thumbnail_store import IMAGE_TYPES, get_thumbnail_store, sniff_content_type
+from .password_utils import hashing_executor
+from .user_tokens import issue_tokens
+from .revocation import revoke_token
+from .pagination import CommentCursorPagination, SearchPagination
+from .search import KINDS, SearchResults, search_enabled
+from .autocomplete import prefix_index
 from rest_framework.decorators import action
+from django.db import IntegrityError, transaction
+from django.shortcuts import get_object_or_404
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from .lesson_import import LessonImportError, create_lessons, read_lesson_file, validate_lesson_rows
+from .ordering import move_lesson
 
 # Generate Token Manually
 
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh, access = issue_tokens(user)
     return {
         'refresh': str(refresh),
-        'access': str(refresh.access_token),
+        'access': str(access),
     }
 
 
@@ -98,9 +119,33 @@ class UserChangePasswordView(APIView):
         serializer = UserChangePasswordSerializer(
             data=request.data, context={'user': request.user})
         serializer.is_valid(raise_exception=True)
+        serializer.save()
         return Response({'msg': 'Password Changed Successfully'}, status=status.HTTP_200_OK)
 
 
+class UserLogoutView(APIView):
+    """
+    Revoke the access token of the request and, when given, the refresh
+    token, so neither can be used again.
+    """
+    renderer_classes = [UserRenderer]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                refresh_token = RefreshToken(refresh)
+            except TokenError:
+                refresh_token = None
+            if refresh_token is None or refresh_token.get(jwt_settings.USER_ID_CLAIM) != request.user.id:
+                return Response({'errors': {'refresh': ['Token is invalid or expired']}},
+                                status=status.HTTP_400_BAD_REQUEST)
+            revoke_token(refresh_token)
+        revoke_token(request.auth, user_id=request.user.id)
+        return Response({'msg': 'Logout Successful'}, status=status.HTTP_200_OK)
+
+
 class SendPasswordResetEmailView(APIView):
     renderer_classes = [UserRenderer]
 
@@ -120,12 +165,13 @@ class UserPasswordResetView(APIView):
         return Response({'msg': 'Password Reset Successfully'}, status=status.HTTP_200_OK)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_models = (Category,)
     
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.filter(user_type='student')
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -147,28 +193,66 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response({'status': 'User block status updated'}, status=status.HTTP_200_OK)
 
 
-class AdminAllCourseViewSet(viewsets.ModelViewSet):
+class AdminAllCourseViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    queryset_optimizer = staticmethod(optimized_courses)
+    conditional_dependencies = (Lesson, Comment, Report)
+
+# `?price=` ranges of the course list: (key, low, high), high exclusive
+COURSE_PRICE_RANGES = (
+    ('0-25', 0, 25),
+    ('25-50', 25, 50),
+    ('50-100', 50, 100),
+    ('100+', 100, None),
+)
 
-class CourseViewSet(viewsets.ModelViewSet):
+
+class CourseViewSet(CachedResponseMixin, ConditionalGetMixin, FacetedListMixin, OptimizedQuerysetMixin,
+                    viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    queryset_optimizer = staticmethod(optimized_courses)
+    filter_backends = [FacetFilterBackend]
+    facets = (
+        Facet('category', 'category__title'),
+        Facet('difficulty', 'difficulty', choices=[value for value, _ in DIFFICULTY]),
+        RangeFacet('price', 'price', COURSE_PRICE_RANGES),
+        BooleanFacet('is_visible', 'is_visible'),
+    )
+    # The list's facet counts cover courses outside the page, and every
+    # course renders its category's title
+    conditional_dependencies = (Course, Category, Lesson, Comment, Report)
+    cache_models = (Course, Category, Lesson, Comment, Report)
+    compact_actions = ('list', 'enrolled_courses')
     
     @action(detail=False, methods=['GET'], permission_classes=[IsAuthenticated])
     def enrolled_courses(self, request):
         user = request.user
-        enrolled_courses = user.enrolled_courses.all()
-        serializer = self.get_serializer(enrolled_courses, many=True)
-        return Response(serializer.data)
-
-
-class TutorCourseViewSet(viewsets.ModelViewSet):
+        enrolled_courses = self.optimize_queryset(
+            Course.objects.filter(id__in=enrolled_course_ids(user)))
+        page = self.paginate_queryset(enrolled_courses)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'])
+    def autocomplete(self, request):
+        """
+        Visible courses for a search box as the user types, most enrolled
+        first: `?q=pyth` matches titles and category titles with a word
+        starting with "pyth". Served from memory (see autocomplete.py).
+        """
+        return Response({'results': prefix_index.complete(request.query_params.get('q', ''))})
+
+
+class TutorCourseViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    queryset_optimizer = staticmethod(optimized_courses)
+    conditional_dependencies = (Lesson, Comment, Report)
     
     @action(detail=False, methods=['GET'], permission_classes=[IsAuthenticated])
     def get_queryset(self):
@@ -176,7 +260,7 @@ class TutorCourseViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         # Filter courses where the tutor is the authenticated user
-        return Course.objects.filter(tutor=user)
+        return self.optimize_queryset(Course.objects.filter(tutor=user))
 
     def create(self, request, *args, **kwargs):
         # Set the tutor to the authenticated user
@@ -188,10 +272,13 @@ class TutorCourseViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    queryset_optimizer = staticmethod(optimized_lessons)
+    conditional_dependencies = (Lesson, Comment, Report)
+    filter_backends = [CourseLessonsFilterBackend]
 
     # def get_queryset(self):
     #     # Get the authenticated user
@@ -235,64 +322,150 @@ class LessonViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class OrderViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['POST'], permission_classes=[IsAuthenticated],
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def bulk(self, request):
+        """
+        Create many lessons in a course the user tutors, all or none.
+        Takes {"course": id, "lessons": [...]} as JSON, or a multipart form
+        with `course` and a CSV or JSON `file`. Every row is validated
+        first; if any is invalid nothing is created and the errors are
+        returned per row.
+        """
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with "course" and "lessons".'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        course_id = request.data.get('course')
+        if not course_id:
+            return Response({"course": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            course = Course.objects.only('id').get(id=course_id, tutor=request.user)
+        except (Course.DoesNotExist, TypeError, ValueError):
+            return Response({"course": ["Invalid course ID."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            upload = request.FILES.get('file')
+            rows = read_lesson_file(upload) if upload else request.data.get('lessons')
+            rows, errors = validate_lesson_rows(rows)
+        except LessonImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        lessons = create_lessons(course, rows)
+        serializer = LessonSerializer(lessons, many=True, fields=LessonSerializer.field_selection(compact=True))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['POST'], permission_classes=[IsAuthenticated])
+    def move(self, request, pk=None):
+        """
+        Move a lesson within its course: {"after": <lesson id>} or
+        {"before": <lesson id>}; an empty body moves it to the end. Only
+        the course's tutor may reorder its lessons.
+        """
+        lesson = get_object_or_404(Lesson.objects.only('id', 'course_id', 'order_key'), pk=pk)
+        if not Course.objects.filter(id=lesson.course_id, tutor=request.user).exists():
+            raise PermissionDenied('Only the course tutor can reorder its lessons.')
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with "after" or "before".'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        anchors = {}
+        for place in ('after', 'before'):
+            anchor_id = request.data.get(place)
+            if anchor_id is None:
+                continue
+            try:
+                anchors[place] = Lesson.objects.only('id', 'order_key').get(
+                    id=anchor_id, course_id=lesson.course_id)
+            except (Lesson.DoesNotExist, TypeError, ValueError):
+                return Response({place: ["Invalid lesson ID."]}, status=status.HTTP_400_BAD_REQUEST)
+            if anchors[place].pk == lesson.pk:
+                return Response({place: ["A lesson can't move next to itself."]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(anchors) > 1:
+            return Response({'error': 'Give either "after" or "before", not both.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        move_lesson(lesson, **anchors)
+        return Response({'id': lesson.id, 'order_key': lesson.order_key})
+
+    @action(detail=True, methods=['POST', 'DELETE'], permission_classes=[IsAuthenticated])
+    def like(self, request, pk=None):
+        """
+        POST likes the lesson, DELETE unlikes it. Both are idempotent:
+        repeating one leaves the like and the lesson's like_count as they are.
+        """
+        lesson = get_object_or_404(Lesson.objects.only('id'), pk=pk)
+        if request.method == 'POST':
+            try:
+                with transaction.atomic():
+                    lesson.likes.add(request.user)
+            except IntegrityError:
+                # A concurrent request liked it first
+                pass
+        else:
+            lesson.likes.remove(request.user)
+        lesson.refresh_from_db(fields=['like_count'])
+        return Response({'liked': request.method == 'POST', 'like_count': lesson.like_count})
+
+    @action(detail=True, methods=['GET', 'POST'], serializer_class=CommentSerializer,
+            pagination_class=CommentCursorPagination)
+    def comments(self, request, pk=None):
+        """
+        GET pages through the lesson's comments, newest first; POST adds one
+        as the signed in user.
+        """
+        lesson = get_object_or_404(Lesson.objects.only('id'), pk=pk)
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(lesson=lesson, user=request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        page = self.paginate_queryset(Comment.objects.filter(lesson=lesson))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+COURSE_PRICE_WINDOWS = {
+    'day': timezone.timedelta(days=1),
+    'week': timezone.timedelta(weeks=1),
+    'month': timezone.timedelta(days=30),
+}
+
+
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticatedOrReadOnly])
     def sum_prices(self, request):
-        total_price = Order.objects.aggregate(total_price=Sum('price'))['total_price']
-        if total_price is None:
-            total_price = 0
+        # Read the maintained rollup buckets instead of scanning every order
+        total_price = total_revenue()
         return Response({'total_price': total_price}, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticatedOrReadOnly])
     def course_prices(self, request):
-        # Get the filter type from request query params
-        filter_type = request.query_params.get('filter', 'all')
-        now = timezone.now()
-
-        # Apply date filtering based on the filter type
-        if filter_type == 'day':
-            start_date = now - timezone.timedelta(days=1)
-        elif filter_type == 'week':
-            start_date = now - timezone.timedelta(weeks=1)
-        elif filter_type == 'month':
-            start_date = now - timezone.timedelta(days=30)
-        else:
-            start_date = None
+        # Bucket size for the totals: hour, day, week or month
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in BUCKET_FUNCTIONS:
+            return Response({'error': f"bucket must be one of {', '.join(BUCKET_FUNCTIONS)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Fetch orders based on the filter
-        if start_date:
-            orders = Order.objects.filter(created_at__gte=start_date)
-        else:
-            orders = Order.objects.all()
-        
-        # Dictionary to hold course data
-        course_data = {}
-
-        # Organize order prices by course
-        for order in orders:
-            course_title = order.course.title
-            if course_title not in course_data:
-                course_data[course_title] = []
-            course_data[course_title].append(order.price)
-
-        # Format the response
-        course_list = []
-        for course_title, prices in course_data.items():
-            course_list.append({
-                'name': course_title,
-                'data': prices
-            })
+        try:
+            start_date = parse_range_bound(request.query_params.get('from'))
+            end_date = parse_range_bound(request.query_params.get('to'), end=True)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Legacy relative windows, used when no explicit start is given
+        filter_type = request.query_params.get('filter', 'all')
+        if start_date is None and filter_type in COURSE_PRICE_WINDOWS:
+            start_date = timezone.now() - COURSE_PRICE_WINDOWS[filter_type]
 
         response_data = {
-            'courseList': course_list
+            'courseList': course_price_buckets(bucket, start_date, end_date)
         }
         return Response(response_data, status=status.HTTP_200_OK)
 
-class UserOrderViewSet(viewsets.ModelViewSet):
+class UserOrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -323,7 +496,7 @@ class UserOrderViewSet(viewsets.ModelViewSet):
 
 
 
-class TutorViewSet(viewsets.ModelViewSet):
+class TutorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.filter(user_type='teacher')
     serializer_class = TutorSerializer
 
@@ -351,6 +524,12 @@ def admin_logout(request):
         admin_access_token = request.COOKIES.get('adminToken')
         if not admin_access_token:
             print('Admin access token not found')
+        else:
+            try:
+                revoke_token(UntypedToken(admin_access_token))
+            except (TokenError, KeyError):
+                # Not a token issued by simplejwt, nothing to revoke
+                pass
         response = JsonResponse({'message': 'Admin logout successful'})
         response.delete_cookie('adminToken')
         return response
@@ -358,18 +537,124 @@ def admin_logout(request):
         return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
+@require_http_methods(["GET", "HEAD"])
+def thumbnail_image(request, digest):
+    # Blobs are content-addressed, so a digest's bytes never change: the
+    # digest is a strong ETag and the response can be cached forever
+    etag = f'"{digest}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, max-age=31536000, immutable',
+    }
+    store = get_thumbnail_store()
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        if not store.exists(digest):
+            raise Http404('Thumbnail not found')
+        response = HttpResponseNotModified()
+    else:
+        try:
+            data = store.read(digest)
+        except FileNotFoundError:
+            raise Http404('Thumbnail not found')
+        content_type = sniff_content_type(data)
+        response = HttpResponse(data, content_type=content_type)
+        response['X-Content-Type-Options'] = 'nosniff'
+        if content_type not in IMAGE_TYPES:
+            # Blobs carried over from before uploads were checked (e.g. SVG)
+            # are downloaded, never rendered on the API's origin
+            response['Content-Disposition'] = f'attachment; filename="{digest}"'
+            response['Content-Security-Policy'] = 'sandbox'
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
 @require_http_methods(["GET"])
 def check_enrollment(request, course_id):
     user = request.user
 
     if user.is_authenticated:
-        try:
-            course = Course.objects.get(id=course_id)
-            if course in user.enrolled_courses.all():
-                return JsonResponse({'enrolled': True})
-            else:
-                return JsonResponse({'enrolled': False})
-        except Course.DoesNotExist:
-            return JsonResponse({'enrolled': False})
+        return JsonResponse({'enrolled': is_enrolled(user, course_id)})
     else:
-        return JsonResponse({'enrolled': False})
\ No newline at end of file
+        return JsonResponse({'enrolled': False})
+
+
+class CheckEnrollmentBatchView(APIView):
+    """
+    Enrollment status for many courses in one request, e.g. for every card
+    on the catalog page. Pass `?ids=1,2,3` or POST {"course_ids": [1, 2, 3]}.
+    """
+
+    def get(self, request, format=None):
+        return self.check(request, request.query_params.get('ids', '').split(','))
+
+    def post(self, request, format=None):
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with "course_ids"'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.check(request, request.data.get('course_ids', []))
+
+    def check(self, request, raw_ids):
+        if not isinstance(raw_ids, list):
+            return Response({'error': 'Course ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        # Refuse oversized requests before parsing any of them
+        if len(raw_ids) > ENROLLMENT_BATCH_MAX_IDS:
+            return Response({'error': f'At most {ENROLLMENT_BATCH_MAX_IDS} course ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            course_ids = list(dict.fromkeys(int(course_id) for course_id in raw_ids if str(course_id).strip()))
+        except (TypeError, ValueError):
+            return Response({'error': 'Course ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.user.is_authenticated:
+            enrolled = enrollment_map(request.user, course_ids)
+        else:
+            enrolled = {course_id: False for course_id in course_ids}
+        return Response({'enrolled': enrolled}, status=status.HTTP_200_OK)
+
+
+
+class SearchView(APIView):
+    """
+    Full-text search over course titles, taglines and descriptions and
+    lesson titles and descriptions, e.g. `?q=django models`, optionally
+    narrowed with `&type=course` or `&type=lesson`. Hits are ranked by
+    BM25, best first, and carry a snippet with the matches in <mark>.
+    """
+
+    def get(self, request, format=None):
+        if not search_enabled():
+            return Response({'error': 'Search needs the SQLite database'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Pass the search terms as ?q='}, status=status.HTTP_400_BAD_REQUEST)
+        kind = request.query_params.get('type') or None
+        if kind is not None and kind not in KINDS:
+            return Response({'error': f'type must be one of: {", ".join(KINDS)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(SearchResults(query, kind), request, view=self)
+        return paginator.get_paginated_response(page)
+
+
+class ResponseCacheStatsView(APIView):
+    """
+    Hit/miss counters of the catalog response cache. DELETE resets them.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response(response_cache_stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request, format=None):
+        reset_response_cache_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class HasherStatsView(APIView):
+    """
+    Queue depth and throughput of the password hashing executor used by the
+    async auth views. Counters are per process.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response(hashing_executor.stats(), status=status.HTTP_200_OK)
@@ -3,14 +3,30 @@ ASGI config for djangoauthapi1 project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests served through ASGI are routed with ``djangoauthapi1.asgi_urls``,
+which swaps in async views for the endpoints that hash passwords.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoauthapi1.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'djangoauthapi1.asgi_urls'
+
+
+class AsyncAuthASGIHandler(ASGIHandler):
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = AsyncAuthASGIHandler()
@@ -0,0 +1,37 @@
+"""
+URLconf of the ASGI application: the password-hashing auth endpoints and
+the hot catalog reads are served by the async views in
+account/async_views.py, everything else by the regular URLconf.
+"""
+from django.urls import path
+
+from account.async_views import (
+    async_check_enrollment,
+    course_detail,
+    course_list,
+    lesson_detail,
+    lesson_list,
+    user_change_password,
+    user_login,
+    user_profile,
+    user_register,
+)
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/auth/register/', user_register, name='user-registration-async'),
+    path('api/auth/signin/', user_login, name='user-login-async'),
+    path('api/auth/change-password/', user_change_password, name='user-change-password-async'),
+    path('api/auth/profile/', user_profile, name='user-profile-async'),
+    path('api/user/details/', user_profile),
+    path('api/user/details/enrolled/<int:course_id>/check/', async_check_enrollment,
+         name='check_enrollment_async'),
+
+    path('api/courses/', course_list, name='course-list-async'),
+    path('api/courses/<int:pk>/', course_detail, name='course-detail-async'),
+    path('api/user/courses/', course_list),
+    path('api/user/courses/<int:pk>/', course_detail),
+    path('api/lessons/', lesson_list, name='lesson-list-async'),
+    path('api/lessons/<int:pk>/', lesson_detail, name='lesson-detail-async'),
+] + sync_urlpatterns
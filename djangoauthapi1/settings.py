@@ -87,13 +87,58 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Generation counters and user versions (account/generations.py). With
+    # more than one worker this must be a cache they all share, e.g.
+    # Memcached or Redis; local memory only suits a single process, and
+    # `check --deploy` fails on it.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+SHARED_CACHE_ALIAS = 'shared'
+
+# Rendered catalog responses (account/response_cache.py); any cache alias works
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 5 * 60
+
+# Seconds a user's cached set of enrolled course ids is kept
+ENROLLMENT_CACHE_TIMEOUT = 60 * 60
+
+# Most course ids one batch enrollment check may carry
+ENROLLMENT_BATCH_MAX_IDS = 100
+
+# Most lessons one bulk create / import (lessons/bulk/) may carry
+LESSON_IMPORT_MAX_ROWS = 1000
+
+# A course's lesson order keys are respread once a move makes one longer
+# than this (account/ordering.py)
+ORDER_KEY_MAX_LENGTH = 24
+
 # JWT Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'account.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'account.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 20,
 }
 
+# Upper bound for the `?page_size=` query parameter on list endpoints
+MAX_PAGE_SIZE = 100
+
+# JSON encoder used by account.renderers.UserRenderer: 'json' (stdlib,
+# byte-identical output), 'orjson' (much faster, compact output) or a dotted
+# path to a callable returning bytes. Falls back to 'json' if not installed.
+USER_RENDERER_JSON_BACKEND = 'json'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -131,6 +176,12 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Content-addressed store for course thumbnails (account/thumbnail_store.py)
+THUMBNAIL_STORE_BACKEND = 'account.thumbnail_store.FileSystemThumbnailStore'
+THUMBNAIL_STORE_ROOT = BASE_DIR / 'media' / 'thumbnails'
+# Largest thumbnail upload, in bytes; PNG, JPEG, GIF and WebP only
+THUMBNAIL_MAX_BYTES = 2 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -146,6 +197,15 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASS')
 EMAIL_USE_TLS = True
 
+# Background task queue (account/tasks.py, `manage.py run_tasks`). Failed
+# tasks are retried after TASK_RETRY_BACKOFF seconds, doubling each time
+# up to TASK_RETRY_MAX_BACKOFF, until TASK_MAX_ATTEMPTS attempts were made
+TASK_BATCH_SIZE = 50
+TASK_LEASE = 5 * 60
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BACKOFF = 30
+TASK_RETRY_MAX_BACKOFF = 60 * 60
+
 
 # JWT Settings
 SIMPLE_JWT = {
@@ -166,6 +226,22 @@ SIMPLE_JWT = {
 
 }
 
+# Users resolved from JWTs are cached in-process (LRU) and in the shared
+# cache for this many seconds; saving a user invalidates both immediately
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_SIZE = 1024
+
+# Revoked JWTs are checked against an in-process Bloom filter rebuilt from
+# the UserToken table this often (and whenever a revocation happens), so
+# only tokens matching the filter cost a query
+REVOCATION_FILTER_TTL = 5 * 60
+REVOCATION_FILTER_ERROR_RATE = 0.001
+
+# The async auth views (asgi.py) hash passwords on this many threads; once
+# MAX_PENDING hashes are queued or running, further requests get a 503
+PASSWORD_HASHER_WORKERS = 4
+PASSWORD_HASHER_MAX_PENDING = 256
+
 PASSWORD_RESET_TIMEOUT = 900          # 900 Sec = 15 Min
 APPEND_SLASH = True
 